@@ -5,7 +5,8 @@ import streamlit as st
 from dotenv import load_dotenv
 load_dotenv()
 
-from firestore_db import get_firestore_client, insert_command_firestore, insert_event_firestore, get_latest_telemetry_firestore, get_recent_events_firestore
+from firestore_db import get_firestore_client, insert_command_with_event_firestore, get_dashboard_data_firestore, query_events_firestore
+from dashboard_widgets import archive_download, current_event_filters, event_filters, event_table, kpi_panel
 
 # --- Inicializar cliente Firestore ---
 client = get_firestore_client()
@@ -32,8 +33,8 @@ with left:
         st.session_state.sp_slider = int(round(sp_text_val))
 
     if st.button("✅ Enviar referencia"):
-        insert_command_firestore(client, sp_ref_cm=float(st.session_state.sp_slider))
-        insert_event_firestore(client, "SETPOINT_CHANGE", f"sp_ref_cm={st.session_state.sp_slider}")
+        insert_command_with_event_firestore(client, "SETPOINT_CHANGE", f"sp_ref_cm={st.session_state.sp_slider}",
+                                            sp_ref_cm=float(st.session_state.sp_slider))
         st.success(f"Referencia enviada: {st.session_state.sp_slider} cm")
 
     st.divider()
@@ -41,20 +42,27 @@ with left:
     c1,c2,c3 = st.columns(3)
     with c1:
         if st.button("▶️ Start"):
-            insert_command_firestore(client, cmd_start=1); insert_event_firestore(client, "START","Start"); st.success("Start enviado")
+            insert_command_with_event_firestore(client, "START","Start", cmd_start=1); st.success("Start enviado")
     with c2:
         if st.button("⏹ Stop"):
-            insert_command_firestore(client, cmd_stop=1); insert_event_firestore(client, "STOP","Stop"); st.warning("Stop enviado")
+            insert_command_with_event_firestore(client, "STOP","Stop", cmd_stop=1); st.warning("Stop enviado")
     with c3:
         if st.button("🛑 E-Stop"):
-            insert_command_firestore(client, cmd_estop=1); insert_event_firestore(client, "ESTOP","Paro de emergencia"); st.error("¡E-Stop!")
+            insert_command_with_event_firestore(client, "ESTOP","Paro de emergencia", cmd_estop=1); st.error("¡E-Stop!")
 
     if st.button("🔄 Refrescar datos"):
         st.experimental_rerun()
 
+    st.divider()
+    archive_download()
+
 with right:
     st.subheader("Estado")
-    df = get_latest_telemetry_firestore(client, 200)
+    # telemetría y eventos se consultan en paralelo
+    ev_filters = current_event_filters()
+    df, ev, ev_cursor, stale = get_dashboard_data_firestore(client, 200, 50, event_type=ev_filters[0], start=ev_filters[1], end=ev_filters[2])
+    if stale:
+        st.caption("⚠️ Sin actualizar (la consulta tardó demasiado): " + ", ".join(sorted(stale)))
     if df.empty:
         st.info("Sin datos aún en telemetry_samples.")
     else:
@@ -68,11 +76,10 @@ with right:
         g1, g2 = st.columns(2)
         with g1: st.line_chart(df.set_index("ts")[["level_cm"]])
         with g2: st.line_chart(df.set_index("ts")[["vfd_rpm"]])
+        st.subheader("Desempeño del control")
+        kpi_panel(df)
 
     st.divider()
     st.subheader("Eventos recientes")
-    ev = get_recent_events_firestore(client, 50)
-    if not ev.empty:
-        st.dataframe(ev, use_container_width=True, hide_index=True)
-    else:
-        st.write("Sin eventos.")
+    event_filters(["SETPOINT_CHANGE", "START", "STOP", "ESTOP"])
+    event_table(ev, ev_cursor, lambda cursor: query_events_firestore(client, *ev_filters, page_size=50, cursor=cursor), ev_filters)
@@ -6,12 +6,12 @@ from datetime import datetime
 # al principio del archivo scada_cloud/app_cloud.py
 from firestore_db import (
     get_firestore_client,
-    insert_command_firestore,
-    insert_event_firestore,
+    insert_command_with_event_firestore,
     insert_telemetry_firestore,
-    get_latest_telemetry_firestore,
-    get_recent_events_firestore
+    get_dashboard_data_firestore,
+    query_events_firestore
 )
+from dashboard_widgets import archive_download, current_event_filters, event_filters, event_table, kpi_panel
 # Inicializar Firestore (sin argumentos)
 try:
     client = get_firestore_client()   # llamar SIN keyword args
@@ -51,8 +51,7 @@ with left:
             sp = st.session_state.sp_slider
 
     if st.button("✅ Enviar referencia"):
-        insert_command_firestore(client, sp_ref_cm=float(sp))
-        insert_event_firestore(client, "SETPOINT_CHANGE", f"sp_ref_cm={sp}")
+        insert_command_with_event_firestore(client, "SETPOINT_CHANGE", f"sp_ref_cm={sp}", sp_ref_cm=float(sp))
         st.success(f"Referencia enviada: {sp} cm")
 
     st.markdown("---")
@@ -60,27 +59,32 @@ with left:
     c1, c2, c3 = st.columns(3)
     with c1:
         if st.button("▶️ Inicio"):
-            insert_command_firestore(client, cmd_start=1)
-            insert_event_firestore(client, "CMD", "START")
+            insert_command_with_event_firestore(client, "CMD", "START", cmd_start=1)
             st.success("Inicio enviado")
     with c2:
         if st.button("⏹ Detener"):
-            insert_command_firestore(client, cmd_stop=1)
-            insert_event_firestore(client, "CMD", "STOP")
+            insert_command_with_event_firestore(client, "CMD", "STOP", cmd_stop=1)
             st.warning("Stop enviado")
     with c3:
         if st.button("🛑 Parada de emergencia"):
-            insert_command_firestore(client, cmd_estop=1)
-            insert_event_firestore(client, "CMD", "ESTOP")
+            insert_command_with_event_firestore(client, "CMD", "ESTOP", cmd_estop=1)
             st.error("E-STOP enviado")
 
     st.markdown("---")
     if st.button("🔄 Actualizar datos"):
         st.experimental_rerun()
 
+    st.markdown("---")
+    archive_download()
+
 with right:
     st.header("Estado")
-    df = get_latest_telemetry_firestore(client, limit=200)
+    # telemetría y eventos se consultan en paralelo
+    ev_filters = current_event_filters()
+    df, ev, ev_cursor, stale = get_dashboard_data_firestore(client, telemetry_limit=200, events_limit=50,
+                                                            event_type=ev_filters[0], start=ev_filters[1], end=ev_filters[2])
+    if stale:
+        st.caption("⚠️ Sin actualizar (la consulta tardó demasiado): " + ", ".join(sorted(stale)))
 
     if df.empty:
         st.info("Sin telemetría aún.")
@@ -102,13 +106,14 @@ with right:
         with g2:
             st.line_chart(df.set_index("ts")[["vfd_rpm"]])
 
+        st.markdown("---")
+        st.header("Desempeño del control")
+        kpi_panel(df)
+
     st.markdown("---")
     st.header("Eventos recientes")
-    ev = get_recent_events_firestore(client, 50)
-    if ev.empty:
-        st.write("Sin eventos.")
-    else:
-        st.dataframe(ev, use_container_width=True, hide_index=True)
+    event_filters(["SETPOINT_CHANGE", "CMD"])
+    event_table(ev, ev_cursor, lambda cursor: query_events_firestore(client, *ev_filters, page_size=50, cursor=cursor), ev_filters)
 
 st.markdown("---")
 st.caption("Nota: la intermitencia 2Hz y el registro continuo de RPM/velocidades lo publica el gateway PLC. Esta app lee y muestra los datos.")
@@ -0,0 +1,90 @@
+# benchmarks/datagen.py
+"""
+Datos sintéticos para los benchmarks: telemetría a 1 Hz de un lazo de nivel con cambios de
+setpoint, alarmas y VFD, más el registro de eventos correspondiente. Todo vectorizado con numpy,
+así que generar meses de muestras tarda segundos.
+"""
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+EVENT_TYPES = ("SETPOINT_CHANGE", "START", "STOP", "ESTOP")
+
+
+def telemetry(days, end=None, seed=0, period_s=1.0):
+    """DataFrame con `days` días de telemetría terminando en `end` (UTC, por defecto ahora)."""
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now(timezone.utc)
+    n = int(days * 86400 / period_s)
+    ts = pd.date_range(end=end, periods=n, freq=pd.Timedelta(seconds=period_s))
+    # setpoint escalonado cada ~20 min; el nivel lo sigue como un primer orden con ruido
+    change_every = int(1200 / period_s)
+    steps = rng.integers(10, 90, size=n // change_every + 1).astype(np.float32)
+    sp = np.repeat(steps, change_every)[:n]
+    level = _first_order(steps, change_every, n, decay=np.exp(-period_s / 60.0))
+    level += rng.normal(0, 0.2, n).astype(np.float32)
+    rpm = np.clip((sp - level) * 60.0, 0, 1750).astype(np.float32)
+    return pd.DataFrame({
+        "ts": ts,
+        "level_cm": level.astype(np.float32),
+        "vfd_rpm": rpm,
+        "vfd_speedcmd": rpm,
+        "blink_2hz": (np.arange(n) % 2).astype(np.uint8),
+        "reached_sp": (np.abs(sp - level) < 1.0).astype(np.uint8),
+        "low_level": (level < 15).astype(np.uint8),
+        "high_level": (level > 85).astype(np.uint8),
+        "setpoint": sp,
+    })
+
+
+def _first_order(steps, change_every, n, decay):
+    """Respuesta de primer orden a setpoints constantes por tramos (forma cerrada por tramo)."""
+    k = np.arange(change_every)
+    out = np.empty(len(steps) * change_every, dtype=np.float32)
+    y = float(steps[0])
+    for i, sp in enumerate(steps):
+        seg = sp + (y - sp) * decay ** k
+        out[i * change_every:(i + 1) * change_every] = seg
+        y = sp + (y - sp) * decay ** change_every
+    return out[:n]
+
+
+def events(days, end=None, seed=0, per_hour=6):
+    """DataFrame con eventos repartidos al azar en `days` días."""
+    rng = np.random.default_rng(seed + 1)
+    end = end or datetime.now(timezone.utc)
+    n = int(days * 24 * per_hour)
+    offsets = np.sort(rng.uniform(0, days * 86400, n))
+    ts = (pd.to_datetime(end) - pd.to_timedelta(days * 86400 - offsets, unit="s")).floor("ms")
+    kinds = rng.choice(EVENT_TYPES, size=n, p=(0.7, 0.1, 0.1, 0.1))
+    return pd.DataFrame({"ts": ts, "event_type": kinds, "details": [f"bench-{i}" for i in range(n)]})
+
+
+# ----------------- Carga en los backends -----------------
+def load_firestore(client, tel, ev):
+    tel_cols = tel.to_dict("list")
+    tel_cols["ts"] = list(tel["ts"].dt.to_pydatetime())
+    keys = list(tel_cols)
+    client.collection("telemetry_samples").bulk_load(
+        dict(zip(keys, row)) for row in zip(*(tel_cols[k] for k in keys)))
+    ev_rows = ev.assign(ts=list(ev["ts"].dt.to_pydatetime())).to_dict("records")
+    client.collection("event_log").bulk_load(ev_rows)
+
+
+def load_sqlite(path, tel, ev, chunk=100000):
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    cols = ["ts", "level_cm", "vfd_rpm", "vfd_speedcmd", "blink_2hz", "reached_sp", "low_level", "high_level",
+            "setpoint"]
+    naive = tel["ts"].dt.tz_convert("UTC").dt.tz_localize(None)
+    for start in range(0, len(tel), chunk):
+        part = tel.iloc[start:start + chunk]
+        rows = zip(naive.iloc[start:start + chunk].dt.to_pydatetime(),
+                   *(part[c].astype(float if c.endswith(("_cm", "_rpm", "cmd", "point")) else int).tolist() for c in cols[1:]))
+        conn.executemany("INSERT INTO telemetry_samples (%s) VALUES (%s)" % (", ".join(cols), ", ".join("?" * len(cols))), rows)
+    ev_naive = ev["ts"].dt.tz_convert("UTC").dt.tz_localize(None).dt.to_pydatetime()
+    conn.executemany("INSERT INTO event_log (ts, event_type, details) VALUES (?, ?, ?)",
+                     zip(ev_naive, ev["event_type"], ev["details"]))
+    conn.commit()
+    conn.close()
@@ -0,0 +1,217 @@
+# benchmarks/fake_firestore.py
+"""
+Cliente Firestore en memoria con lo que usa firestore_db.py: collection().add / document().set,
+batch(), select, where, order_by, start_after, limit y stream.
+
+Cuenta lecturas de documentos, escrituras y viajes de ida y vuelta (stats) y puede simular
+la latencia de red con latency_s por viaje. Las consultas ordenadas usan un índice ordenado
+por campo (bisect), así que el coste crece con lo leído y no con el tamaño de la colección.
+"""
+import bisect
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from google.cloud import firestore
+
+DESCENDING = firestore.Query.DESCENDING
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, key=None):
+        self.id = doc_id
+        self._data = data
+        self._key = key
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref, doc):
+        self._writes.append((ref, doc))
+
+    def commit(self):
+        self._client._round_trip()
+        with self._client._lock:
+            for ref, doc in self._writes:
+                ref._collection._put(ref.id, doc)
+        self._writes = []
+
+
+class FakeDocumentRef:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, doc):
+        self._collection._client._round_trip()
+        with self._collection._client._lock:
+            self._collection._put(self.id, doc)
+
+
+class FakeQuery:
+    def __init__(self, collection, fields=None, filters=(), order=None, cursor=None, limit=None):
+        self._collection = collection
+        self._fields = fields
+        self._filters = tuple(filters)
+        self._order = order
+        self._cursor = cursor
+        self._limit = limit
+
+    def _copy(self, **changes):
+        args = dict(fields=self._fields, filters=self._filters, order=self._order,
+                    cursor=self._cursor, limit=self._limit)
+        args.update(changes)
+        return FakeQuery(self._collection, **args)
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(order=(field, direction == DESCENDING))
+
+    def start_after(self, snapshot):
+        return self._copy(cursor=snapshot._key)
+
+    def limit(self, n):
+        return self._copy(limit=int(n))
+
+    def stream(self):
+        client = self._collection._client
+        client._round_trip()
+        with client._lock:
+            rows = list(itertools.islice(self._iter(), self._limit))
+            client.stats["reads"] += len(rows)
+        for doc_id, data, key in rows:
+            if self._fields is not None:
+                data = {k: data[k] for k in self._fields if k in data}
+            yield FakeSnapshot(doc_id, data, key)
+
+    def _iter(self):
+        field, desc = self._order or ("__name__", False)
+        keys, ids = self._collection._index(field)
+        lo, hi = 0, len(keys)
+        rest = []
+        for f, op, value in self._filters:
+            # los rangos sobre el campo ordenado se resuelven con bisect; el resto se filtra
+            if f == field and op in (">=", ">", "<", "<="):
+                probe = (value,)
+                if op == ">=":
+                    lo = max(lo, bisect.bisect_left(keys, probe))
+                elif op == ">":
+                    lo = max(lo, bisect.bisect_right(keys, (value, "\uffff")))
+                elif op == "<":
+                    hi = min(hi, bisect.bisect_left(keys, probe))
+                else:
+                    hi = min(hi, bisect.bisect_right(keys, (value, "\uffff")))
+            else:
+                rest.append((f, op, value))
+        if self._cursor is not None:
+            if desc:
+                hi = min(hi, bisect.bisect_left(keys, self._cursor))
+            else:
+                lo = max(lo, bisect.bisect_right(keys, self._cursor))
+        positions = range(hi - 1, lo - 1, -1) if desc else range(lo, hi)
+        docs = self._collection._docs
+        for i in positions:
+            data = docs[ids[i]]
+            if all(_match(data.get(f), op, v) for f, op, v in rest):
+                yield ids[i], data, keys[i]
+
+
+def _match(actual, op, value):
+    if actual is None:
+        return False
+    return {"==": actual == value, ">=": actual >= value, ">": actual > value,
+            "<": actual < value, "<=": actual <= value}[op]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(self)
+        self._client = client
+        self.name = name
+        self._docs = {}
+        self._indexes = {}
+        self._ids = itertools.count()
+
+    def _new_id(self):
+        return "%012d" % next(self._ids)
+
+    def document(self, doc_id=None):
+        return FakeDocumentRef(self, doc_id or self._new_id())
+
+    def add(self, doc):
+        ref = self.document()
+        ref.set(doc)
+        return None, ref
+
+    def _put(self, doc_id, doc):
+        now = self._client.now()
+        doc = {k: (now if v is firestore.SERVER_TIMESTAMP else v) for k, v in doc.items()}
+        if doc_id in self._docs:
+            self._indexes.clear()
+        else:
+            # mantener los índices ya construidos en lugar de reordenar toda la colección
+            for field, (keys, ids) in self._indexes.items():
+                if field == "__name__" or field in doc:
+                    key = (doc_id,) if field == "__name__" else (doc[field], doc_id)
+                    pos = bisect.bisect_right(keys, key)
+                    keys.insert(pos, key)
+                    ids.insert(pos, doc_id)
+        self._docs[doc_id] = doc
+        self._client.stats["writes"] += 1
+
+    def bulk_load(self, docs):
+        """Carga documentos ya materializados (con ts) sin contar escrituras ni viajes."""
+        with self._client._lock:
+            for doc in docs:
+                self._docs[self._new_id()] = doc
+            self._indexes.clear()
+
+    def _index(self, field):
+        index = self._indexes.get(field)
+        if index is None:
+            if field == "__name__":
+                pairs = sorted(((doc_id,), doc_id) for doc_id in self._docs)
+            else:
+                pairs = sorted(((d[field], doc_id), doc_id) for doc_id, d in self._docs.items() if field in d)
+            index = self._indexes[field] = ([k for k, _ in pairs], [i for _, i in pairs])
+        return index
+
+
+class FakeFirestoreClient:
+    def __init__(self, latency_s=0.0, clock=None):
+        self.latency_s = latency_s
+        self.now = clock or (lambda: datetime.now(timezone.utc))
+        self.stats = {"reads": 0, "writes": 0, "round_trips": 0}
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.stats["round_trips"] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
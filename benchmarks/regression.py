@@ -0,0 +1,112 @@
+# benchmarks/regression.py
+"""
+Comprobaciones de regresión sobre los sustitutos locales (sin Firestore ni MySQL reales):
+
+    python -m benchmarks.regression
+
+Cada check_* lanza AssertionError si el comportamiento vuelve a romperse.
+"""
+import threading
+import time
+
+import firestore_db as fdb
+from benchmarks import datagen
+from benchmarks.fake_firestore import FakeFirestoreClient
+
+
+def _client(latency_s=0.0, days=0.5):
+    client = FakeFirestoreClient(latency_s=latency_s)
+    datagen.load_firestore(client, datagen.telemetry(days), datagen.events(days))
+    return client
+
+
+def _in_thread(fn, *args, **kwargs):
+    out = {}
+    thread = threading.Thread(target=lambda: out.setdefault("result", fn(*args, **kwargs)))
+    thread.start()
+    return thread, out
+
+
+def check_limits_not_shared():
+    """Dos sesiones concurrentes con límites distintos reciben cada una lo que pidió."""
+    client = _client(latency_s=0.3)
+    ta, a = _in_thread(fdb.get_dashboard_data_firestore, client, 500, 50)
+    tb, b = _in_thread(fdb.get_dashboard_data_firestore, client, 10, 10)
+    ta.join(); tb.join()
+    tel_a, ev_a, _, stale_a = a["result"]
+    tel_b, ev_b, _, stale_b = b["result"]
+    assert not stale_a and not stale_b
+    assert (len(tel_a), len(ev_a)) == (500, 50), (len(tel_a), len(ev_a))
+    assert (len(tel_b), len(ev_b)) == (10, 10), (len(tel_b), len(ev_b))
+
+
+def check_stale_not_shared_between_clients():
+    """El último resultado bueno de un cliente no se sirve como stale a otro."""
+    fast, slow = _client(), _client(latency_s=0.5)
+    fdb.get_dashboard_data_firestore(fast, 20, 5)
+    tel, ev, _, stale = fdb.get_dashboard_data_firestore(slow, 20, 5, timeout=0.05)
+    assert stale == {"telemetry", "events", "setpoints"}
+    assert tel.empty and ev.empty
+    time.sleep(0.6)
+
+
+def check_own_write_visible():
+    """Tras escribir, la sesión no reutiliza una consulta de eventos enviada antes de su escritura."""
+    client = _client()
+    real = fdb.query_events_firestore
+
+    def slow_response(*args, **kwargs):
+        result = real(*args, **kwargs)
+        time.sleep(0.5)  # la lectura ya se hizo; la respuesta tarda en volver
+        return result
+
+    fdb.query_events_firestore = slow_response
+    try:
+        other, _ = _in_thread(fdb.get_dashboard_data_firestore, client, 50, 50)
+        time.sleep(0.1)
+    finally:
+        fdb.query_events_firestore = real
+    fdb.insert_command_with_event_firestore(client, "SETPOINT_CHANGE", "regresion-propia", sp_ref_cm=42)
+    _, ev, _, stale = fdb.get_dashboard_data_firestore(client, 50, 50)
+    other.join()
+    assert not stale
+    assert "regresion-propia" in set(ev["details"])
+
+
+def check_shared_future_not_cancelled():
+    """Una sesión que vence no cancela la consulta que otra sesión aún espera."""
+    client = _client(latency_s=0.5)
+    # ocupar los 4 hilos del executor para que las siguientes consultas queden pendientes
+    fdb.get_dashboard_data_firestore(client, 1, 1, timeout=0.01)
+    fdb.get_dashboard_data_firestore(client, 2, 2, timeout=0.01)
+    ta, a = _in_thread(fdb.get_dashboard_data_firestore, client, 3, 3, timeout=0.05)
+    tb, b = _in_thread(fdb.get_dashboard_data_firestore, client, 3, 3, timeout=5.0)
+    ta.join(); tb.join()
+    assert a["result"][3] == {"telemetry", "events", "setpoints"}
+    tel, ev, _, stale = b["result"]
+    assert not stale and (len(tel), len(ev)) == (3, 3), (stale, len(tel), len(ev))
+
+
+def check_setpoint_history_shared():
+    """El setpoint de cada muestra sale de los comandos enviados, en su instante, para cualquier sesión."""
+    from control_kpis import KPITracker
+    tel = datagen.telemetry(0.01).drop(columns="setpoint")  # como el gateway: sin campo setpoint
+    now = {}
+    client = FakeFirestoreClient(clock=lambda: now["ts"])
+    datagen.load_firestore(client, tel, datagen.events(0.01))
+    for i, sp in ((300, 30), (600, 70)):
+        now["ts"] = tel["ts"].iloc[i].to_pydatetime()
+        fdb.insert_command_with_event_firestore(client, "SETPOINT_CHANGE", f"sp_ref_cm={sp}", sp_ref_cm=sp)
+    df, _, _, stale = fdb.get_dashboard_data_firestore(client, len(tel), 5)
+    assert not stale
+    sp = df["setpoint"].to_numpy()
+    assert all(v != v for v in sp[:300]) and set(sp[300:600]) == {30.0} and set(sp[600:]) == {70.0}
+    segments = KPITracker().update(df).segments()
+    assert list(segments["setpoint_cm"]) == [30.0, 70.0], list(segments["setpoint_cm"])
+
+
+if __name__ == "__main__":
+    checks = [value for name, value in sorted(globals().items()) if name.startswith("check_")]
+    for check in checks:
+        check()
+        print("ok  ", check.__name__)
@@ -0,0 +1,132 @@
+# benchmarks/run.py
+"""
+Benchmarks de la capa de datos (firestore_db.py y mysql_db.py) sobre sustitutos locales:
+FakeFirestoreClient en memoria y SQLite detrás del pool de mysql_db.
+
+    python -m benchmarks.run --days 1 7 --limits 50 200 1000
+    python -m benchmarks.run --backend mysql --days 30 90 --latency-ms 20 --csv resultados.csv
+
+Para cada tamaño de datos y límite reporta latencia por llamada (mediana y p95), documentos o
+filas leídos y viajes de ida y vuelta por llamada, y el pico de memoria de una llamada.
+El cliente Firestore falso guarda los documentos como dicts: ~1 GB por semana de datos a 1 Hz.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from benchmarks import datagen
+
+# pandas avisa de que la conexión no es SQLAlchemy; con el sustituto SQLite es lo esperado
+warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+
+
+def measure(fn, repeat, counters, reset):
+    fn()  # calentamiento: índices del fake, conexiones del pool
+    reset()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result = {key: value / repeat for key, value in counters().items()}
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times.sort()
+    result.update({
+        "p50_ms": 1000 * statistics.median(times),
+        "p95_ms": 1000 * times[min(len(times) - 1, int(0.95 * len(times)))],
+        "peak_kib": peak / 1024,
+    })
+    return result
+
+
+def firestore_cases(client, limits):
+    import firestore_db as fdb
+    yield "insert_command_with_event_firestore", None, lambda: fdb.insert_command_with_event_firestore(
+        client, "START", "bench", cmd_start=1)
+    yield "insert_telemetry_firestore", None, lambda: fdb.insert_telemetry_firestore(
+        client, 50.0, 900.0, 900.0, 1, 0, 0, 0, setpoint=50.0)
+    for limit in limits:
+        first_page = fdb.query_events_firestore(client, page_size=limit)[1]
+        yield "get_latest_telemetry_firestore", limit, lambda: fdb.get_latest_telemetry_firestore(client, limit)
+        yield "get_recent_events_firestore", limit, lambda: fdb.get_recent_events_firestore(client, limit)
+        yield "query_events_firestore(tipo)", limit, lambda: fdb.query_events_firestore(
+            client, event_type="STOP", page_size=limit)
+        if first_page is not None:  # con menos eventos que el límite no hay segunda página
+            yield "query_events_firestore(pág. 2)", limit, lambda: fdb.query_events_firestore(
+                client, page_size=limit, cursor=first_page)
+        yield "get_dashboard_data_firestore", limit, lambda: fdb.get_dashboard_data_firestore(
+            client, telemetry_limit=limit, events_limit=limit)
+
+
+def mysql_cases(limits):
+    import mysql_db
+    yield "insert_command_with_event", None, lambda: mysql_db.insert_command_with_event("START", "bench", cmd_start=1)
+    # escritura masiva: el límite es el número de filas por llamada (add_many + flush)
+    writer = mysql_db.TelemetryBulkWriter(batch_size=1000, flush_interval=3600)
+    samples = datagen.telemetry(max(limits) / 86400).drop(columns="ts").to_dict("records")
+    for limit in limits:
+        yield "TelemetryBulkWriter", limit, lambda: (writer.add_many(samples[:limit]), writer.flush())
+    for limit in limits:
+        first_page = mysql_db.query_events(page_size=limit)[1]
+        yield "get_latest_telemetry", limit, lambda: mysql_db.get_latest_telemetry(limit)
+        yield "get_recent_events", limit, lambda: mysql_db.get_recent_events(limit)
+        yield "query_events(tipo)", limit, lambda: mysql_db.query_events(event_type="STOP", page_size=limit)
+        if first_page is not None:
+            yield "query_events(pág. 2)", limit, lambda: mysql_db.query_events(page_size=limit, cursor=first_page)
+        yield "get_dashboard_data", limit, lambda: mysql_db.get_dashboard_data(limit, limit)
+
+
+def run(backends, days_list, limits, repeat, latency_s):
+    rows = []
+    for days in days_list:
+        tel = datagen.telemetry(days)
+        ev = datagen.events(days)
+        print(f"· {days} día(s): {len(tel)} muestras, {len(ev)} eventos")
+
+        if "firestore" in backends:
+            from benchmarks.fake_firestore import FakeFirestoreClient
+            client = FakeFirestoreClient(latency_s=latency_s)
+            datagen.load_firestore(client, tel, ev)
+            for name, limit, fn in firestore_cases(client, limits):
+                stats = measure(fn, repeat, lambda: dict(client.stats), client.reset_stats)
+                rows.append({"backend": "firestore", "dias": days, "funcion": name, "limite": limit, **stats})
+            del client
+
+        if "mysql" in backends:
+            from benchmarks import sqlite_backend
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, "bench.sqlite")
+                stats_obj = sqlite_backend.install(path, latency_s=latency_s)
+                datagen.load_sqlite(path, tel, ev)
+                for name, limit, fn in mysql_cases(limits):
+                    stats = measure(fn, repeat, lambda: dict(stats_obj.counts), stats_obj.reset)
+                    rows.append({"backend": "mysql", "dias": days, "funcion": name, "limite": limit, **stats})
+                import mysql_db
+                mysql_db.set_pool(None)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de la capa de datos del SCADA")
+    parser.add_argument("--backend", nargs="+", choices=["firestore", "mysql"], default=["firestore", "mysql"])
+    parser.add_argument("--days", nargs="+", type=float, default=[1, 7], help="tamaños del histórico en días")
+    parser.add_argument("--limits", nargs="+", type=int, default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latencia simulada por viaje")
+    parser.add_argument("--csv", help="guardar los resultados en este CSV")
+    args = parser.parse_args()
+
+    results = run(args.backend, args.days, args.limits, args.repeat, args.latency_ms / 1000)
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.float_format", "{:.2f}".format):
+        print(results.to_string(index=False))
+    if args.csv:
+        results.to_csv(args.csv, index=False)
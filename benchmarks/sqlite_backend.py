@@ -0,0 +1,139 @@
+# benchmarks/sqlite_backend.py
+"""
+Sustituto local de MySQL para mysql_db.py: SQLite detrás de una conexión con la misma
+interfaz que usamos de pymysql (cursor/execute con %s, begin, commit, rollback, ping).
+
+install(path) apunta el pool de mysql_db a esta base; stats cuenta filas leídas y viajes,
+y latency_s simula la latencia de red por sentencia.
+"""
+import sqlite3
+import threading
+import time
+
+import pymysql
+
+import mysql_db
+import mysql_schema
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS control_commands (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        cmd_start INTEGER, cmd_stop INTEGER, cmd_estop INTEGER, sp_ref_cm REAL)""",
+    """CREATE TABLE IF NOT EXISTS event_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        event_type TEXT, details TEXT)""",
+    """CREATE TABLE IF NOT EXISTS telemetry_samples (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        level_cm REAL, vfd_rpm REAL, vfd_speedcmd REAL,
+        blink_2hz INTEGER, reached_sp INTEGER, low_level INTEGER, high_level INTEGER, setpoint REAL)""",
+    "CREATE INDEX IF NOT EXISTS idx_telemetry_samples_ts ON telemetry_samples (ts)",
+]
+
+
+class Stats:
+    def __init__(self, latency_s=0.0):
+        self.latency_s = latency_s
+        self.counts = {"reads": 0, "round_trips": 0}
+        self._lock = threading.Lock()
+
+    def add(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def reset(self):
+        for key in self.counts:
+            self.counts[key] = 0
+
+
+class _Cursor:
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._stats.add("round_trips")
+        if self._stats.latency_s:
+            time.sleep(self._stats.latency_s)
+        try:
+            return self._cursor.execute(sql.replace("%s", "?"), params)
+        except sqlite3.OperationalError as ex:
+            # columna inexistente: el mismo error que daría pymysql (ER_BAD_FIELD_ERROR)
+            if str(ex).startswith("no such column"):
+                raise pymysql.err.OperationalError(mysql_db.ER_BAD_FIELD_ERROR, str(ex)) from ex
+            raise
+
+    def executemany(self, sql, seq):
+        self._stats.add("round_trips")
+        if self._stats.latency_s:
+            time.sleep(self._stats.latency_s)
+        return self._cursor.executemany(sql.replace("%s", "?"), seq)
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.add("reads", len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        self._stats.add("reads", len(rows))
+        return rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión SQLite con la forma de una conexión pymysql en autocommit."""
+
+    def __init__(self, path, stats):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     isolation_level=None, check_same_thread=False, timeout=30)
+        self._stats = stats
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor(), self._stats)
+
+    def begin(self):
+        self._conn.execute("BEGIN")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    for ddl in SCHEMA + [d.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS")
+                         for d in mysql_schema.EVENT_LOG_INDEXES.values()]:
+        conn.execute(ddl)
+    conn.commit()
+    conn.close()
+
+
+def install(path, latency_s=0.0, pool_size=5):
+    """Crea el esquema y hace que mysql_db use esta base; devuelve el objeto Stats."""
+    create_schema(path)
+    stats = Stats(latency_s)
+    mysql_db.set_pool(mysql_db.MySQLPool(lambda: SQLiteConnection(path, stats), size=pool_size))
+    return stats
@@ -0,0 +1,189 @@
+# control_kpis.py
+"""
+Indicadores de desempeño del lazo de nivel, por cambio de setpoint:
+tiempo de subida (10 % -> 90 %), sobrepico, tiempo de establecimiento, error estacionario,
+tiempo con low_level / high_level activos y ciclo de trabajo del VFD.
+
+KPITracker se actualiza de forma incremental: cada update() procesa solo las muestras
+más nuevas que la última vista, con operaciones vectorizadas de numpy sobre el trozo.
+"""
+import numpy as np
+import pandas as pd
+
+
+class KPITracker:
+    """
+    - band_pct / band_min_cm: banda de establecimiento, el mayor entre % del escalón y cm fijos
+    - rpm_on: RPM a partir de las cuales el VFD cuenta como encendido
+    - ss_window: muestras finales promediadas para el error estacionario
+    - max_gap_s: huecos mayores (gateway caído) no suman tiempo
+    - max_segments: segmentos (cambios de setpoint) que se conservan
+    """
+
+    def __init__(self, band_pct=2.0, band_min_cm=0.5, rpm_on=1.0, ss_window=30, max_gap_s=10.0, max_segments=50):
+        self.band_pct = band_pct
+        self.band_min_cm = band_min_cm
+        self.rpm_on = rpm_on
+        self.ss_window = ss_window
+        self.max_gap_s = max_gap_s
+        self.max_segments = max_segments
+        self.last_ts = None
+        self.last_level = None
+        self.last_sp = None
+        self._segments = []
+
+    # ----------------- Actualización -----------------
+    def update(self, df, setpoint=None):
+        """
+        Incorpora las muestras de df (orden cronológico, columnas de get_latest_telemetry*)
+        con ts posterior a la última procesada. El setpoint sale de la columna "setpoint" si
+        trae valores; los huecos se completan con el último conocido o con el argumento setpoint.
+        Si la columna falta o viene vacía, manda el argumento setpoint.
+        """
+        if df is None or df.empty:
+            return self
+        ts = pd.to_datetime(df["ts"], utc=True)
+        new = (ts > self.last_ts).to_numpy() if self.last_ts is not None else np.ones(len(df), dtype=bool)
+        if not new.any():
+            return self
+        ts = ts[new].reset_index(drop=True)
+        t = ts.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+        y = df["level_cm"].to_numpy(dtype=np.float64)[new]
+
+        sp = df["setpoint"].to_numpy(dtype=np.float64)[new] if "setpoint" in df else np.full(len(t), np.nan)
+        if np.isnan(sp).all():
+            # sin setpoint en la telemetría (columna ausente o vacía, p. ej. documentos de Firestore sin
+            # el campo): vale el que indique quien llama (la última referencia enviada)
+            fallback = setpoint if setpoint is not None else self.last_sp
+        else:
+            fallback = self.last_sp if self.last_sp is not None else setpoint
+        sp = pd.Series(sp).ffill().fillna(np.nan if fallback is None else float(fallback)).to_numpy()
+        if np.isnan(sp).all():
+            return self  # sin setpoint conocido no hay nada que medir
+
+        # intervalo que termina en cada muestra; el primero empieza en la última muestra anterior
+        prev_t = np.concatenate(([t[0] if self.last_ts is None else self.last_ts.value / 1e9], t[:-1]))
+        dt = t - prev_t
+        dt[(dt < 0) | (dt > self.max_gap_s)] = 0.0
+        low = df["low_level"].to_numpy()[new].astype(bool)
+        high = df["high_level"].to_numpy()[new].astype(bool)
+        vfd_on = df["vfd_rpm"].to_numpy(dtype=np.float64)[new] > self.rpm_on
+
+        # cortes: donde cambia el setpoint respecto a la muestra anterior (incluida la del trozo previo)
+        prev_sp = np.concatenate(([np.nan if self.last_sp is None else self.last_sp], sp[:-1]))
+        cuts = np.flatnonzero(~np.isclose(sp, prev_sp) & ~np.isnan(sp))
+        bounds = list(cuts) + [len(t)]
+        if bounds[0] != 0:
+            bounds.insert(0, 0)  # continúa el segmento abierto
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if a not in cuts and not self._segments:
+                continue  # muestras anteriores al primer setpoint conocido
+            if a in cuts:
+                y0 = self.last_level if a == 0 and self.last_level is not None else y[max(a - 1, 0)]
+                self._start_segment(ts[a], t[a], sp[a], y0, complete=self.last_ts is not None or a > 0)
+            seg = self._segments[-1]
+            self._update_segment(seg, t[a:b], y[a:b], dt[a:b], low[a:b], high[a:b], vfd_on[a:b])
+
+        self.last_ts = ts.iloc[-1]
+        self.last_level = y[-1]
+        self.last_sp = sp[-1]
+        del self._segments[:-self.max_segments]
+        return self
+
+    def _start_segment(self, ts, t, sp, y0, complete):
+        step = sp - y0
+        self._segments.append({
+            "start": ts, "t0": t, "setpoint": sp, "y0": y0, "step": step,
+            # el primer segmento que ve el tracker empieza a mitad de una respuesta
+            "complete": bool(complete),
+            "band": max(abs(step) * self.band_pct / 100.0, self.band_min_cm),
+            "t10": None, "t90": None, "peak": -np.inf,
+            "settled_at": None, "pending_settle": False,
+            "tail": np.empty(0), "dur_s": 0.0, "low_s": 0.0, "high_s": 0.0, "vfd_s": 0.0,
+        })
+
+    def _update_segment(self, seg, t, y, dt, low, high, vfd_on):
+        seg["dur_s"] += dt.sum()
+        seg["low_s"] += dt[low].sum()
+        seg["high_s"] += dt[high].sum()
+        seg["vfd_s"] += dt[vfd_on].sum()
+
+        if abs(seg["step"]) > 1e-9:
+            progress = (y - seg["y0"]) / seg["step"]
+            seg["peak"] = max(seg["peak"], progress.max())
+            for key, level in (("t10", 0.1), ("t90", 0.9)):
+                if seg[key] is None:
+                    hit = np.flatnonzero(progress >= level)
+                    if hit.size:
+                        seg[key] = t[hit[0]]
+
+        err = seg["setpoint"] - y
+        out = np.flatnonzero(np.abs(err) > seg["band"])
+        if out.size:
+            last = out[-1]
+            # establecido en la primera muestra dentro de banda tras la última fuera de banda
+            seg["settled_at"] = t[last + 1] if last + 1 < len(t) else None
+            seg["pending_settle"] = last + 1 >= len(t)
+        elif seg["pending_settle"] or (seg["settled_at"] is None and seg["t0"] == t[0]):
+            seg["settled_at"] = t[0]
+            seg["pending_settle"] = False
+        seg["tail"] = np.concatenate((seg["tail"], err))[-self.ss_window:]
+
+    # ----------------- Resultados -----------------
+    def _row(self, seg):
+        # un segmento incompleto no tiene el escalón real: subida, sobrepico y establecimiento no aplican
+        complete = seg["complete"]
+        rise = np.nan
+        if complete and seg["t10"] is not None and seg["t90"] is not None:
+            rise = seg["t90"] - seg["t10"]
+        overshoot = np.nan
+        if complete and np.isfinite(seg["peak"]):
+            overshoot = max(0.0, (seg["peak"] - 1.0) * 100.0)
+        settled = seg["settled_at"] is not None
+        dur = seg["dur_s"]
+        return {
+            "inicio": seg["start"],
+            "setpoint_cm": seg["setpoint"],
+            "escalon_cm": seg["step"],
+            "subida_s": rise,
+            "sobrepico_pct": overshoot,
+            "establecimiento_s": seg["settled_at"] - seg["t0"] if complete and settled else np.nan,
+            "error_ss_cm": seg["tail"].mean() if settled and seg["tail"].size else np.nan,
+            "low_level_s": seg["low_s"],
+            "high_level_s": seg["high_s"],
+            "duty_vfd_pct": 100.0 * seg["vfd_s"] / dur if dur > 0 else np.nan,
+            "completo": complete,
+        }
+
+    def segments(self):
+        """Un renglón por cambio de setpoint, del más antiguo al más reciente."""
+        return pd.DataFrame([self._row(seg) for seg in self._segments])
+
+    def current(self):
+        """KPIs del segmento en curso (dict) o None si aún no hay datos."""
+        return self._row(self._segments[-1]) if self._segments else None
+
+
+def apply_setpoint_history(df, history):
+    """
+    Completa la columna setpoint de df (huecos o columna ausente) con el historial de setpoints
+    enviados: a cada muestra le toca el último enviado en o antes de su ts. history tiene columnas
+    ts y setpoint (get_setpoint_history*). Las muestras anteriores al primer envío quedan en NaN.
+    """
+    if df is None or df.empty or history is None or history.empty:
+        return df
+    history = history.dropna(subset=["setpoint"]).sort_values("ts")
+    sent_at = pd.to_datetime(history["ts"], utc=True).to_numpy(dtype="datetime64[ns]")
+    ts = pd.to_datetime(df["ts"], utc=True).to_numpy(dtype="datetime64[ns]")
+    idx = np.searchsorted(sent_at, ts, side="right") - 1
+    sent = history["setpoint"].to_numpy(dtype=np.float64)
+    from_history = np.where(idx >= 0, sent[np.maximum(idx, 0)], np.nan)
+    current = df["setpoint"].to_numpy(dtype=np.float64) if "setpoint" in df else np.full(len(df), np.nan)
+    df = df.copy()
+    df["setpoint"] = np.where(np.isnan(current), from_history, current).astype(np.float32)
+    return df
+
+
+def compute_kpis(df, setpoint=None, **kwargs):
+    """KPIs de una ventana completa de una vez (sin estado)."""
+    return KPITracker(**kwargs).update(df, setpoint).segments()
@@ -0,0 +1,142 @@
+# dashboard_widgets.py
+# Piezas de UI comunes a app_cloud.py, app_firebase.py y LOCAL_firestore.py
+from datetime import datetime, time, timedelta, timezone
+
+import pandas as pd
+import streamlit as st
+
+ALL_EVENTS = "(todos)"
+
+
+def current_event_filters(key="ev"):
+    """
+    Filtros del registro de eventos (event_type, start, end) según el estado de los widgets.
+    Se puede llamar antes de dibujar event_filters(), para lanzar la consulta al inicio del panel.
+    """
+    choice = st.session_state.get(key + "_type", ALL_EVENTS)
+    days = st.session_state.get(key + "_range", ())
+    event_type = None if choice == ALL_EVENTS else choice
+    start = end = None
+    if len(days) >= 1:
+        start = datetime.combine(days[0], time.min, tzinfo=timezone.utc)
+    if len(days) == 2:
+        end = datetime.combine(days[1], time.min, tzinfo=timezone.utc) + timedelta(days=1)
+    return event_type, start, end
+
+
+def event_filters(event_types, key="ev"):
+    """Dibuja los filtros de tipo y rango de fechas; devuelve lo mismo que current_event_filters."""
+    f1, f2 = st.columns(2)
+    with f1:
+        st.selectbox("Tipo de evento", [ALL_EVENTS] + list(event_types), key=key + "_type")
+    with f2:
+        st.date_input("Rango de fechas", value=(), key=key + "_range")
+    return current_event_filters(key)
+
+
+def event_table(first_page, first_cursor, fetch_page, filters, key="ev"):
+    """
+    Tabla de eventos con carga perezosa.
+    - first_page / first_cursor: la primera página, leída junto con el resto del panel
+    - fetch_page(cursor) -> (df, next_cursor): pide la página siguiente
+    Al pulsar "Cargar más" la vista se congela (páginas guardadas en session_state) para que
+    los eventos nuevos no desplacen las páginas ya cargadas; cambiar los filtros la reinicia.
+    """
+    state = st.session_state
+    if state.get(key + "_filters") != filters:
+        state[key + "_filters"] = filters
+        state[key + "_pages"] = []
+        state[key + "_cursor"] = None
+    pages = state[key + "_pages"]
+
+    table = st.empty()
+    b1, b2 = st.columns(2)
+    cursor = state[key + "_cursor"] if pages else first_cursor
+    with b1:
+        if cursor is not None and st.button("⬇️ Cargar más", key=key + "_more"):
+            if not pages:
+                pages.append(first_page)
+            df, state[key + "_cursor"] = fetch_page(cursor)
+            pages.append(df)
+    with b2:
+        if pages and st.button("🔄 Volver a lo más reciente", key=key + "_reset"):
+            pages.clear()
+            state[key + "_cursor"] = None
+
+    ev = pd.concat(pages, ignore_index=True) if pages else first_page
+    if ev.empty:
+        table.write("Sin eventos.")
+    else:
+        table.dataframe(ev, use_container_width=True, hide_index=True)
+    if pages:
+        st.caption(f"{len(ev)} eventos cargados (vista fija)")
+
+
+def archive_download(key="arch"):
+    """
+    Descarga de un día del archivo Parquet (telemetry_archive.py), como el Parquet del día o CSV.
+    st.download_button guarda el archivo en la memoria del servidor mientras dure la sesión,
+    así que se entrega de a un día: lo descargado queda acotado a ~86 400 muestras.
+    """
+    import os
+    import telemetry_archive
+    with st.expander("📦 Exportar histórico"):
+        archive_dir = telemetry_archive.ARCHIVE_DIR
+        days = telemetry_archive.archived_days(archive_dir)
+        if not days:
+            st.caption(f"No hay archivo en '{archive_dir}'. Genéralo con telemetry_archive.py.")
+            return
+        c1, c2 = st.columns(2)
+        with c1:
+            day = st.selectbox("Día (UTC)", days[::-1], key=key + "_day")
+        with c2:
+            fmt = st.radio("Formato", ["Parquet", "CSV"], horizontal=True, key=key + "_fmt")
+        st.caption("Se exporta un día por descarga; para rangos largos usa el archivo Parquet "
+                   "directamente (telemetry_archive.scan_archive).")
+        if not st.button("Preparar descarga", key=key + "_prepare"):
+            return
+        if fmt == "Parquet":
+            # el Parquet del día ya está comprimido: se entrega tal cual
+            with open(telemetry_archive.day_path(day, archive_dir), "rb") as f:
+                st.download_button("⬇️ Descargar Parquet", f, file_name=f"telemetria_{day}.parquet",
+                                   mime="application/octet-stream", key=key + "_download")
+            return
+        start = datetime.combine(datetime.strptime(day, "%Y-%m-%d").date(), time.min, tzinfo=timezone.utc)
+        path, rows = telemetry_archive.export_csv(start, start + timedelta(days=1), archive_dir)
+        try:
+            with open(path, "rb") as f:
+                st.download_button(f"⬇️ Descargar {rows} muestras", f, file_name=f"telemetria_{day}.csv",
+                                   mime="text/csv", key=key + "_download")
+        finally:
+            os.remove(path)
+
+
+def _fmt(value, unit, digits=1):
+    return "—" if value is None or pd.isna(value) else f"{value:.{digits}f} {unit}"
+
+
+def kpi_panel(df, setpoint=None, key="kpi"):
+    """
+    KPIs del lazo de nivel (control_kpis.KPITracker). El tracker vive en session_state y en
+    cada rerun solo procesa las muestras nuevas de df. El setpoint sale de la columna de df (que
+    get_dashboard_data* completa con el historial de referencias); setpoint solo cubre lo que falte.
+    """
+    from control_kpis import KPITracker
+    tracker = st.session_state.setdefault(key, KPITracker())
+    tracker.update(df, setpoint)
+    cur = tracker.current()
+    if cur is None:
+        st.caption("Sin setpoint conocido: no se pueden calcular los KPIs.")
+        return
+    k1, k2, k3, k4, k5 = st.columns(5)
+    k1.metric("Subida", _fmt(cur["subida_s"], "s"))
+    k2.metric("Sobrepico", _fmt(cur["sobrepico_pct"], "%"))
+    k3.metric("Establecimiento", _fmt(cur["establecimiento_s"], "s"))
+    k4.metric("Error estacionario", _fmt(cur["error_ss_cm"], "cm", 2))
+    k5.metric("Duty VFD", _fmt(cur["duty_vfd_pct"], "%", 0))
+    st.caption(f"SP {cur['setpoint_cm']:.1f} cm desde {cur['inicio']:%H:%M:%S} · "
+               f"nivel bajo {cur['low_level_s']:.0f} s · nivel alto {cur['high_level_s']:.0f} s"
+               + ("" if cur["completo"] else " · escalón iniciado antes de abrir el panel: "
+                  "subida, sobrepico y establecimiento desde el próximo cambio de SP"))
+    with st.expander("KPIs por cambio de setpoint"):
+        st.dataframe(tracker.segments().iloc[::-1], use_container_width=True, hide_index=True)
@@ -4,7 +4,7 @@ import json
 import streamlit as st
 from google.cloud import firestore
 from google.oauth2 import service_account
-from datetime import datetime
+from datetime import datetime, timezone
 
 def get_firestore_client(secret_name="firebase", env_name="FIREBASE_KEY_PATH"):
     """
@@ -51,21 +51,47 @@ def get_firestore_client(secret_name="firebase", env_name="FIREBASE_KEY_PATH"):
     raise RuntimeError("No se pudo inicializar Firestore: añade st.secrets['%s'] o define env %s" % (secret_name, env_name))
 
 # --- Inserts ---
-def insert_command_firestore(client, cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
-    doc = {
+def _command_doc(cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    return {
         "ts": firestore.SERVER_TIMESTAMP,
         "cmd_start": int(bool(cmd_start)),
         "cmd_stop": int(bool(cmd_stop)),
         "cmd_estop": int(bool(cmd_estop)),
         "sp_ref_cm": None if sp_ref_cm is None else float(sp_ref_cm)
     }
-    client.collection("control_commands").add(doc)
+
+def _event_doc(event_type, details):
+    return {"ts": firestore.SERVER_TIMESTAMP, "event_type": event_type, "details": details}
+
+def _scope(client):
+    """Ámbito de parallel_fetch para este cliente: lecturas y escrituras del mismo proyecto."""
+    return ("firestore", id(client))
+
+def _note_write(client):
+    from parallel_fetch import note_write
+    note_write(_scope(client))
+
+def insert_command_firestore(client, cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    client.collection("control_commands").add(_command_doc(cmd_start, cmd_stop, cmd_estop, sp_ref_cm))
+    _note_write(client)
 
 def insert_event_firestore(client, event_type, details):
-    doc = {"ts": firestore.SERVER_TIMESTAMP, "event_type": event_type, "details": details}
-    client.collection("event_log").add(doc)
+    client.collection("event_log").add(_event_doc(event_type, details))
+    _note_write(client)
 
-def insert_telemetry_firestore(client, level_cm, vfd_rpm, vfd_speedcmd, blink_2hz, reached_sp, low_level, high_level):
+def insert_command_with_event_firestore(client, event_type, details, cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    """
+    Escribe el comando y su evento de auditoría en un solo WriteBatch:
+    un único viaje de ida y vuelta, y o se guardan los dos o ninguno.
+    """
+    batch = client.batch()
+    batch.set(client.collection("control_commands").document(), _command_doc(cmd_start, cmd_stop, cmd_estop, sp_ref_cm))
+    batch.set(client.collection("event_log").document(), _event_doc(event_type, details))
+    batch.commit()
+    _note_write(client)
+
+def insert_telemetry_firestore(client, level_cm, vfd_rpm, vfd_speedcmd, blink_2hz, reached_sp, low_level, high_level,
+                               setpoint=None):
     doc = {
         "ts": firestore.SERVER_TIMESTAMP,
         "level_cm": float(level_cm),
@@ -76,46 +102,165 @@ def insert_telemetry_firestore(client, level_cm, vfd_rpm, vfd_speedcmd, blink_2h
         "low_level": int(bool(low_level)),
         "high_level": int(bool(high_level))
     }
+    if setpoint is not None:
+        doc["setpoint"] = float(setpoint)
     client.collection("telemetry_samples").add(doc)
 
 # --- Reads ---
-def get_latest_telemetry_firestore(client, limit=200):
-    q = client.collection("telemetry_samples").order_by("ts", direction=firestore.Query.DESCENDING).limit(limit)
-    docs = q.stream()
-    rows = []
-    for d in docs:
-        data = d.to_dict()
-        ts = data.get("ts")
-        # ts ya viene como datetime si está materializado; si no, puede llegar None momentáneamente
-        rows.append({
-            "ts": ts if ts is not None else datetime.utcnow(),
-            "level_cm": data.get("level_cm", 0.0),
-            "vfd_rpm": data.get("vfd_rpm", 0.0),
-            "vfd_speedcmd": data.get("vfd_speedcmd", 0.0),
-            "blink_2hz": data.get("blink_2hz", 0),
-            "reached_sp": data.get("reached_sp", 0),
-            "low_level": data.get("low_level", 0),
-            "high_level": data.get("high_level", 0),
-        })
+# Campos y tipos de telemetry_samples; el orden define las columnas del DataFrame
+TELEMETRY_FLOAT_FIELDS = ("level_cm", "vfd_rpm", "vfd_speedcmd")
+TELEMETRY_FLAG_FIELDS = ("blink_2hz", "reached_sp", "low_level", "high_level")
+# opcionales: las muestras antiguas no los tienen y se leen como NaN
+TELEMETRY_OPTIONAL_FIELDS = ("setpoint",)
+TELEMETRY_SELECT = ("ts",) + TELEMETRY_FLOAT_FIELDS + TELEMETRY_FLAG_FIELDS + TELEMETRY_OPTIONAL_FIELDS
+EVENT_FIELDS = ("ts", "event_type", "details")
+
+def _telemetry_frame(ts, floats, flags):
+    """Construye el DataFrame de telemetría de una vez a partir de columnas ya acumuladas."""
+    import numpy as np
     import pandas as pd
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df = df.sort_values("ts")
-    return df
+    data = {"ts": pd.to_datetime(ts, utc=True)}
+    for name in TELEMETRY_FLOAT_FIELDS + TELEMETRY_OPTIONAL_FIELDS:
+        data[name] = np.asarray(floats[name], dtype=np.float32)
+    for name in TELEMETRY_FLAG_FIELDS:
+        data[name] = np.asarray(flags[name], dtype=np.uint8)
+    return pd.DataFrame(data)
 
-def get_recent_events_firestore(client, limit=50):
-    q = client.collection("event_log").order_by("ts", direction=firestore.Query.DESCENDING).limit(limit)
-    docs = q.stream()
-    rows = []
+def _collect_telemetry(docs):
+    """Acumula los documentos en listas por columna; devuelve (ts, floats, flags, último_snapshot)."""
+    ts = []
+    floats = {name: [] for name in TELEMETRY_FLOAT_FIELDS}
+    optional = {name: [] for name in TELEMETRY_OPTIONAL_FIELDS}
+    flags = {name: [] for name in TELEMETRY_FLAG_FIELDS}
+    last = None
     for d in docs:
         data = d.to_dict()
-        rows.append({"ts": data.get("ts"), "event_type": data.get("event_type"), "details": data.get("details")})
+        # ts ya viene como datetime si está materializado; si no, puede llegar None momentáneamente
+        t = data.get("ts")
+        ts.append(t if t is not None else datetime.now(timezone.utc))
+        for name, col in floats.items():
+            col.append(data.get(name) or 0.0)
+        for name, col in optional.items():
+            value = data.get(name)
+            col.append(float("nan") if value is None else value)
+        for name, col in flags.items():
+            col.append(data.get(name) or 0)
+        last = d
+    floats.update(optional)
+    return ts, floats, flags, last
+
+def get_latest_telemetry_firestore(client, limit=200):
+    """Últimas `limit` muestras en orden cronológico (float32 / uint8 / ts datetime64 UTC)."""
+    q = (client.collection("telemetry_samples")
+         .select(TELEMETRY_SELECT)
+         .order_by("ts", direction=firestore.Query.DESCENDING)
+         .limit(limit))
+    ts, floats, flags, _ = _collect_telemetry(q.stream())
+    # la consulta llega de más nuevo a más viejo: invertir las columnas deja el orden cronológico
+    ts.reverse()
+    for col in floats.values():
+        col.reverse()
+    for col in flags.values():
+        col.reverse()
+    return _telemetry_frame(ts, floats, flags)
+
+def iter_telemetry_firestore(client, start, end, chunk_size=5000):
+    """
+    Recorre telemetry_samples en [start, end) en orden cronológico, en DataFrames de como mucho
+    `chunk_size` filas (memoria acotada). Cada trozo continúa con start_after del anterior.
+    """
+    q = (client.collection("telemetry_samples")
+         .select(TELEMETRY_SELECT)
+         .where("ts", ">=", start)
+         .where("ts", "<", end)
+         .order_by("ts"))
+    cursor = None
+    while True:
+        page = q.start_after(cursor) if cursor is not None else q
+        ts, floats, flags, cursor = _collect_telemetry(page.limit(chunk_size).stream())
+        if ts:
+            yield _telemetry_frame(ts, floats, flags)
+        if len(ts) < chunk_size:
+            break
+
+def query_events_firestore(client, event_type=None, start=None, end=None, page_size=50, cursor=None):
+    """
+    Página de event_log del más reciente al más antiguo, filtrada en el servidor.
+    - event_type: solo ese tipo (requiere el índice compuesto de firestore.indexes.json)
+    - start / end: rango [start, end) sobre ts
+    - cursor: el next_cursor devuelto por la página anterior
+    Devuelve (df, next_cursor); next_cursor es None cuando no hay más páginas.
+    """
     import pandas as pd
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows).sort_values("ts", ascending=False)
-    return df
+    q = client.collection("event_log").select(EVENT_FIELDS)
+    if event_type:
+        q = q.where("event_type", "==", event_type)
+    if start is not None:
+        q = q.where("ts", ">=", start)
+    if end is not None:
+        q = q.where("ts", "<", end)
+    q = q.order_by("ts", direction=firestore.Query.DESCENDING)
+    if cursor is not None:
+        # el snapshot del último documento: Firestore continúa justo después (ts y id de documento)
+        q = q.start_after(cursor)
+    cols = {name: [] for name in EVENT_FIELDS}
+    last = None
+    n = 0
+    for d in q.limit(page_size).stream():
+        data = d.to_dict()
+        for name, col in cols.items():
+            col.append(data.get(name))
+        last = d
+        n += 1
+    cols["ts"] = pd.to_datetime(cols["ts"], utc=True)
+    return pd.DataFrame(cols), (last if n == page_size else None)
 
+def get_recent_events_firestore(client, limit=50):
+    """Últimos `limit` eventos, del más reciente al más antiguo."""
+    return query_events_firestore(client, page_size=limit)[0]
 
+def get_setpoint_history_firestore(client, limit=50):
+    """
+    Setpoints enviados (control_commands.sp_ref_cm) entre los últimos `limit` comandos, en orden
+    cronológico: DataFrame con ts y setpoint. Es el mismo para todas las sesiones.
+    """
+    import pandas as pd
+    q = (client.collection("control_commands")
+         .select(("ts", "sp_ref_cm"))
+         .order_by("ts", direction=firestore.Query.DESCENDING)
+         .limit(limit))
+    ts, sp = [], []
+    for d in q.stream():
+        data = d.to_dict()
+        # los comandos START/STOP no llevan referencia
+        if data.get("sp_ref_cm") is not None and data.get("ts") is not None:
+            ts.append(data["ts"])
+            sp.append(float(data["sp_ref_cm"]))
+    ts.reverse()
+    sp.reverse()
+    return pd.DataFrame({"ts": pd.to_datetime(ts, utc=True), "setpoint": pd.Series(sp, dtype="float64")})
 
+def get_dashboard_data_firestore(client, telemetry_limit=200, events_limit=50, timeout=5.0,
+                                 event_type=None, start=None, end=None, setpoint_limit=50):
+    """
+    Lee telemetría, la primera página de eventos y el historial de setpoints en paralelo (la
+    latencia es la de la consulta más lenta, no la suma). La columna setpoint de la telemetría
+    se completa con ese historial. Devuelve (df_telemetría, df_eventos, cursor_eventos, stale);
+    stale contiene "telemetry", "events" y/o "setpoints" si esa consulta superó su timeout y
+    se está mostrando el último resultado conocido.
+    """
+    import pandas as pd
+    from control_kpis import apply_setpoint_history
+    from parallel_fetch import fetch_parallel
+    scope = _scope(client)
+    results, stale = fetch_parallel({
+        "telemetry": lambda: get_latest_telemetry_firestore(client, telemetry_limit),
+        "events": lambda: query_events_firestore(client, event_type, start, end, events_limit),
+        "setpoints": lambda: get_setpoint_history_firestore(client, setpoint_limit),
+    }, timeout=timeout, keys={
+        "telemetry": (scope, "telemetry", telemetry_limit),
+        "events": (scope, "events", event_type, start, end, events_limit),
+        "setpoints": (scope, "setpoints", setpoint_limit),
+    }, default=lambda name: (pd.DataFrame(), None) if name == "events" else pd.DataFrame())
+    ev, ev_cursor = results["events"]
+    return apply_setpoint_history(results["telemetry"], results["setpoints"]), ev, ev_cursor, stale
@@ -0,0 +1,501 @@
+# mysql_db.py
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import pymysql as mysql
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default=None):
+    """
+    Lee una variable de configuración:
+    - primero la variable de entorno (Render / ejecución local)
+    - si no existe, st.secrets (Streamlit Cloud)
+    """
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        value = st.secrets.get(name)
+    except Exception:
+        value = None
+    if value is None:
+        if default is None:
+            raise RuntimeError("Falta la configuración %s (env o st.secrets)" % name)
+        return default
+    return value
+
+
+# ----------------- Pool de conexiones -----------------
+class MySQLPool:
+    """
+    Pool de conexiones compartido por todas las sesiones de Streamlit del proceso.
+    - size: máximo de conexiones abiertas a la vez
+    - recycle: segundos tras los cuales una conexión se cierra y se abre de nuevo
+    - ping_after: segundos de inactividad tras los cuales se verifica con ping()
+    - timeout: segundos máximos esperando una conexión libre
+    """
+
+    def __init__(self, creator, size=5, recycle=1800, ping_after=30, timeout=10):
+        self._creator = creator
+        self.size = int(size)
+        self.recycle = float(recycle)
+        self.ping_after = float(ping_after)
+        self.timeout = float(timeout)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _new(self):
+        now = time.monotonic()
+        return [self._creator(), now, now]  # [conexión, creada, último uso]
+
+    def _discard(self, entry):
+        try:
+            entry[0].close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        try:
+            entry = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new()
+        now = time.monotonic()
+        if now - entry[1] > self.recycle:
+            self._discard(entry)
+            return self._new()
+        if now - entry[2] > self.ping_after:
+            ping = getattr(entry[0], "ping", None)
+            if ping is not None:
+                try:
+                    ping(reconnect=False)
+                except Exception:
+                    self._discard(entry)
+                    return self._new()
+        return entry
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool; se devuelve al salir del bloque with."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError("Pool MySQL agotado: no hay conexiones libres tras %.0fs" % self.timeout)
+        entry = None
+        try:
+            entry = self._checkout()
+            yield entry[0]
+        except Exception:
+            # si falló la consulta, deshacer; si ni eso funciona, la conexión está rota
+            if entry is not None:
+                try:
+                    entry[0].rollback()
+                except Exception:
+                    self._discard(entry)
+                    entry = None
+            raise
+        finally:
+            if entry is not None:
+                entry[2] = time.monotonic()
+                self._idle.put(entry)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connect():
+    """Abre una conexión nueva a MySQL con la configuración de entorno / secrets."""
+    return mysql.connect(
+        host=_setting("DB_HOST"),
+        port=int(_setting("DB_PORT", 3306)),
+        user=_setting("DB_USER"),
+        password=_setting("DB_PASSWORD"),
+        database=_setting("DB_NAME"),
+        autocommit=True,  # una conexión reutilizada no debe quedarse en una transacción (snapshot viejo)
+        # las fechas viajan sin zona: la sesión en UTC hace que CURRENT_TIMESTAMP y los filtros coincidan
+        init_command="SET time_zone = '+00:00'",
+    )
+
+
+def _naive_utc(value):
+    """pymysql descarta la zona de un datetime: se convierte antes a UTC sin tzinfo."""
+    if value is not None and getattr(value, "tzinfo", None) is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def get_pool():
+    """Devuelve el pool del proceso, creándolo la primera vez (DB_POOL_SIZE, DB_POOL_RECYCLE)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLPool(
+                    connect,
+                    size=int(_setting("DB_POOL_SIZE", 5)),
+                    recycle=float(_setting("DB_POOL_RECYCLE", 1800)),
+                )
+    return _pool
+
+
+def set_pool(pool):
+    """Reemplaza el pool del proceso (p. ej. para apuntar a otra base de datos)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None and old is not pool:
+        old.close()
+
+
+# ----------------- Acceso a BD -----------------
+def _execute_command(cur, cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    if sp_ref_cm is None:
+        cur.execute(
+            "INSERT INTO control_commands (cmd_start, cmd_stop, cmd_estop) VALUES (%s,%s,%s)",
+            (int(cmd_start), int(cmd_stop), int(cmd_estop)),
+        )
+    else:
+        cur.execute(
+            "INSERT INTO control_commands (cmd_start, cmd_stop, cmd_estop, sp_ref_cm) VALUES (%s,%s,%s,%s)",
+            (int(cmd_start), int(cmd_stop), int(cmd_estop), float(sp_ref_cm)),
+        )
+
+
+def _execute_event(cur, event_type, details):
+    cur.execute("INSERT INTO event_log (event_type, details) VALUES (%s,%s)", (event_type, details))
+
+
+def _scope(pool):
+    """Ámbito de parallel_fetch para este pool: lecturas y escrituras de la misma base."""
+    return ("mysql", id(pool))
+
+
+def _note_write(pool):
+    from parallel_fetch import note_write
+    note_write(_scope(pool))
+
+
+def insert_command(cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    pool = get_pool()
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        _execute_command(cur, cmd_start, cmd_stop, cmd_estop, sp_ref_cm)
+        conn.commit(); cur.close()
+    _note_write(pool)
+
+
+def insert_event(event_type, details):
+    pool = get_pool()
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        _execute_event(cur, event_type, details)
+        conn.commit(); cur.close()
+    _note_write(pool)
+
+
+def insert_command_with_event(event_type, details, cmd_start=0, cmd_stop=0, cmd_estop=0, sp_ref_cm=None):
+    """
+    Escribe el comando y su evento de auditoría en una sola transacción:
+    si falla cualquiera de los dos INSERT, el pool hace rollback y no queda nada a medias.
+    """
+    pool = get_pool()
+    with pool.connection() as conn:
+        conn.begin()
+        cur = conn.cursor()
+        _execute_command(cur, cmd_start, cmd_stop, cmd_estop, sp_ref_cm)
+        _execute_event(cur, event_type, details)
+        conn.commit(); cur.close()
+    _note_write(pool)
+
+
+# ----------------- Escritura masiva de telemetría -----------------
+TELEMETRY_COLUMNS = ("ts", "level_cm", "vfd_rpm", "vfd_speedcmd", "blink_2hz", "reached_sp",
+                     "low_level", "high_level", "setpoint")
+_TELEMETRY_INSERT = "INSERT INTO telemetry_samples (%s) VALUES (%s)" % (
+    ", ".join(TELEMETRY_COLUMNS), ", ".join(["%s"] * len(TELEMETRY_COLUMNS)))
+
+
+def _telemetry_row(sample):
+    ts = sample.get("ts") or datetime.now(timezone.utc)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)  # DATETIME en UTC
+    sp = sample.get("setpoint")
+    return (
+        ts,
+        float(sample["level_cm"]),
+        float(sample["vfd_rpm"]),
+        float(sample["vfd_speedcmd"]),
+        int(bool(sample.get("blink_2hz"))),
+        int(bool(sample.get("reached_sp"))),
+        int(bool(sample.get("low_level"))),
+        int(bool(sample.get("high_level"))),
+        None if sp is None else float(sp),
+    )
+
+
+class TelemetryBulkWriter:
+    """
+    Buffer acotado de muestras para telemetry_samples que se inserta en lotes:
+    executemany de pymysql junta los VALUES en INSERT multi-fila, uno por lote y transacción.
+    add() solo encola; un hilo de fondo vacía el buffer, así que una BD lenta o caída no
+    detiene el lazo del gateway.
+    - batch_size: filas por INSERT; al alcanzarlas se despierta al hilo de fondo
+    - flush_interval: segundos máximos que una muestra espera en el buffer (aunque no lleguen más)
+    - max_buffer: filas máximas en memoria; si la BD no responde se descartan las más viejas
+    - retry_min / retry_max: espera tras un fallo, que se duplica hasta retry_max
+    """
+
+    def __init__(self, pool=None, batch_size=1000, flush_interval=1.0, max_buffer=50000,
+                 retry_min=1.0, retry_max=60.0):
+        self._pool = pool
+        self.batch_size = int(batch_size)
+        self.flush_interval = float(flush_interval)
+        self.retry_min = float(retry_min)
+        self.retry_max = float(retry_max)
+        self._buffer = deque(maxlen=int(max_buffer))
+        self._lock = threading.Lock()        # protege el buffer; nunca se retiene durante la E/S
+        self._flush_lock = threading.Lock()  # un solo flush a la vez (hilo de fondo o close)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._oldest = None
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="telemetry-bulk-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, sample):
+        """Encola una muestra (dict con las claves de TELEMETRY_COLUMNS; ts opcional)."""
+        self.add_many((sample,))
+
+    def add_many(self, samples):
+        with self._lock:
+            for sample in samples:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped += 1
+                self._buffer.append(_telemetry_row(sample))
+            # despertar al hilo si el buffer estaba vacío (programa el flush) o ya hay un lote
+            wake = self._oldest is None or len(self._buffer) >= self.batch_size
+            if self._oldest is None and self._buffer:
+                self._oldest = time.monotonic()
+        if wake:
+            self._wake.set()
+
+    def _next_wait(self):
+        """Segundos hasta el próximo flush programado (None: esperar a que llegue algo)."""
+        with self._lock:
+            if len(self._buffer) >= self.batch_size:
+                return 0.0
+            if self._oldest is None:
+                return None
+            return max(0.0, self._oldest + self.flush_interval - time.monotonic())
+
+    def _run(self):
+        retry = self.retry_min
+        while not self._stop.is_set():
+            wait = self._next_wait()
+            if wait is None or wait > 0:
+                self._wake.wait(wait)
+            self._wake.clear()
+            if self._stop.is_set() or self._next_wait() != 0.0:
+                continue
+            try:
+                self.flush()
+                retry = self.retry_min
+            except Exception as ex:
+                # las filas siguen en el buffer; se reintenta tras la espera (o al cerrar)
+                logger.warning("No se pudo escribir telemetría en MySQL (%d en buffer, reintento en %.0fs): %s",
+                               len(self._buffer), retry, ex)
+                self._stop.wait(retry)
+                retry = min(retry * 2, self.retry_max)
+
+    def flush(self):
+        """Inserta todo lo pendiente en lotes de batch_size; devuelve las filas escritas."""
+        written = 0
+        with self._flush_lock:
+            pool = self._pool or get_pool()
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                try:
+                    with pool.connection() as conn:
+                        conn.begin()
+                        cur = conn.cursor()
+                        cur.executemany(_TELEMETRY_INSERT, batch)
+                        conn.commit(); cur.close()
+                except Exception:
+                    # el lote vuelve al frente del buffer; si no cabe se pierden las filas más viejas
+                    with self._lock:
+                        rows = batch + list(self._buffer)
+                        keep = rows[-self._buffer.maxlen:]
+                        self.dropped += len(rows) - len(keep)
+                        self._buffer.clear()
+                        self._buffer.extend(keep)
+                    raise
+                written += len(batch)
+                with self._lock:
+                    self.written += len(batch)
+            with self._lock:
+                # lo que llegó durante la escritura espera como mucho flush_interval desde ahora
+                self._oldest = time.monotonic() if self._buffer else None
+        return written
+
+    def close(self, timeout=None):
+        """Detiene el hilo de fondo y escribe lo pendiente (propaga el error si la BD no responde)."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
+
+
+# ----------------- Lectura de telemetría -----------------
+# Una tabla anterior a mysql_schema.migrate_telemetry_table no tiene setpoint: mientras no se
+# migre se lee sin esa columna y se vuelve a probar cada _SETPOINT_RECHECK_S segundos
+ER_BAD_FIELD_ERROR = 1054
+_SETPOINT_RECHECK_S = 300
+_setpoint_missing_since = None
+
+
+def _telemetry_fields():
+    fields = "ts, level_cm, vfd_rpm, vfd_speedcmd, blink_2hz, reached_sp, low_level, high_level"
+    missing = (_setpoint_missing_since is not None
+               and time.monotonic() - _setpoint_missing_since < _SETPOINT_RECHECK_S)
+    return fields if missing else fields + ", setpoint"
+
+
+def _read_telemetry(build_sql, params):
+    """pd.read_sql de build_sql(campos); si la tabla aún no tiene setpoint, repite sin él."""
+    global _setpoint_missing_since
+    fields = _telemetry_fields()
+    try:
+        with get_pool().connection() as conn:
+            return pd.read_sql(build_sql(fields), conn, params=params)
+    except Exception as ex:
+        # según la versión, pandas deja pasar el error del driver o lo envuelve en DatabaseError
+        bad_field = any(isinstance(err, mysql.err.OperationalError) and err.args[0] == ER_BAD_FIELD_ERROR
+                        for err in (ex, ex.__cause__))
+        if not bad_field or not fields.endswith("setpoint"):
+            raise
+        logger.warning("telemetry_samples sin columna setpoint: ejecuta python mysql_schema.py para migrarla")
+        _setpoint_missing_since = time.monotonic()
+        with get_pool().connection() as conn:
+            return pd.read_sql(build_sql(_telemetry_fields()), conn, params=params)
+
+
+def get_latest_telemetry(n_rows=200):
+    df = _read_telemetry(
+        lambda fields: "SELECT %s FROM telemetry_samples ORDER BY ts DESC LIMIT %%s" % fields,
+        (int(n_rows),),
+    )
+    if not df.empty:
+        df = df.sort_values("ts")
+    return df
+
+
+def iter_telemetry(start, end, chunk_size=5000):
+    """
+    Recorre telemetry_samples en [start, end) en orden cronológico, en DataFrames de como mucho
+    `chunk_size` filas. Pagina por keyset sobre (ts, id); cada trozo usa una conexión del pool.
+    """
+    cursor = None
+    while True:
+        sql = "SELECT id, %s FROM telemetry_samples WHERE ts >= %%s AND ts < %%s"
+        params = [start, end]
+        if cursor is not None:
+            sql += " AND (ts > %%s OR (ts = %%s AND id > %%s))"
+            params += [cursor[0], cursor[0], cursor[1]]
+        sql += " ORDER BY ts, id LIMIT %%s"
+        params.append(int(chunk_size))
+        df = _read_telemetry(lambda fields: sql % fields, tuple(params))
+        if not df.empty:
+            cursor = (df["ts"].iloc[-1].to_pydatetime(), int(df["id"].iloc[-1]))
+            yield df.drop(columns="id")
+        if len(df) < int(chunk_size):
+            break
+
+
+def query_events(event_type=None, start=None, end=None, page_size=50, cursor=None):
+    """
+    Página de event_log del más reciente al más antiguo, filtrada en el servidor.
+    Pagina por keyset sobre (ts, id) en lugar de OFFSET, así el coste no crece con la tabla
+    (índices en mysql_schema.EVENT_LOG_INDEXES). Devuelve (df, next_cursor).
+    """
+    where, params = [], []
+    if event_type:
+        where.append("event_type = %s"); params.append(event_type)
+    if start is not None:
+        where.append("ts >= %s"); params.append(_naive_utc(start))
+    if end is not None:
+        where.append("ts < %s"); params.append(_naive_utc(end))
+    if cursor is not None:
+        where.append("(ts < %s OR (ts = %s AND id < %s))"); params += [cursor[0], cursor[0], cursor[1]]
+    sql = "SELECT id, ts, event_type, details FROM event_log"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts DESC, id DESC LIMIT %s"
+    params.append(int(page_size))
+    with get_pool().connection() as conn:
+        df = pd.read_sql(sql, conn, params=tuple(params))
+    next_cursor = None
+    if len(df) == int(page_size):
+        next_cursor = (df["ts"].iloc[-1].to_pydatetime(), int(df["id"].iloc[-1]))
+    return df.drop(columns="id"), next_cursor
+
+
+def get_recent_events(n_rows=50):
+    return query_events(page_size=n_rows)[0]
+
+
+def get_setpoint_history(n_rows=50):
+    """Últimos `n_rows` setpoints enviados (control_commands.sp_ref_cm) en orden cronológico: ts, setpoint."""
+    with get_pool().connection() as conn:
+        df = pd.read_sql(
+            """
+            SELECT ts, sp_ref_cm AS setpoint
+            FROM control_commands
+            WHERE sp_ref_cm IS NOT NULL
+            ORDER BY ts DESC
+            LIMIT %s
+            """, conn, params=(int(n_rows),)
+        )
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def get_dashboard_data(n_telemetry=200, n_events=50, timeout=5.0, event_type=None, start=None, end=None,
+                       n_setpoints=50):
+    """
+    Lee telemetría, la primera página de eventos y el historial de setpoints en paralelo, cada
+    consulta con su propia conexión del pool. Devuelve (df_telemetría, df_eventos, cursor_eventos,
+    stale) igual que get_dashboard_data_firestore.
+    """
+    from control_kpis import apply_setpoint_history
+    from parallel_fetch import fetch_parallel
+    scope = _scope(get_pool())
+    results, stale = fetch_parallel({
+        "telemetry": lambda: get_latest_telemetry(n_telemetry),
+        "events": lambda: query_events(event_type, start, end, n_events),
+        "setpoints": lambda: get_setpoint_history(n_setpoints),
+    }, timeout=timeout, keys={
+        "telemetry": (scope, "telemetry", n_telemetry),
+        "events": (scope, "events", event_type, start, end, n_events),
+        "setpoints": (scope, "setpoints", n_setpoints),
+    }, default=lambda name: (pd.DataFrame(), None) if name == "events" else pd.DataFrame())
+    ev, ev_cursor = results["events"]
+    return apply_setpoint_history(results["telemetry"], results["setpoints"]), ev, ev_cursor, stale
@@ -0,0 +1,230 @@
+# mysql_schema.py
+"""
+Esquema MySQL que necesita mysql_db:
+- índices de event_log para query_events
+- telemetry_samples particionada por día (RANGE COLUMNS sobre ts), para insertar en bloque
+  y aplicar la retención borrando particiones enteras en lugar de filas
+
+Una telemetry_samples anterior (sin setpoint ni particiones) se migra con migrate_telemetry_table.
+
+Uso:
+    python mysql_schema.py                       # crea / migra / verifica tablas, índices y particiones
+    python mysql_schema.py --retention-days 30   # además elimina los días más antiguos
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import pymysql as mysql
+
+# query_events filtra por event_type y rango de ts y pagina por (ts, id), así que event_log
+# necesita id como clave primaria autoincremental (ensure_event_log_id la añade si falta);
+# en InnoDB cada índice secundario ya incluye la clave primaria (id)
+EVENT_LOG_INDEXES = {
+    "idx_event_log_ts": "CREATE INDEX idx_event_log_ts ON event_log (ts)",
+    "idx_event_log_type_ts": "CREATE INDEX idx_event_log_type_ts ON event_log (event_type, ts)",
+}
+
+# La clave primaria empieza por ts: las filas quedan agrupadas en disco por tiempo, las
+# inserciones van al final y las lecturas por rango (ORDER BY ts DESC LIMIT, iter_telemetry)
+# recorren páginas contiguas. La columna de partición debe estar en toda clave única.
+TELEMETRY_TABLE = """
+CREATE TABLE IF NOT EXISTS telemetry_samples (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    ts DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    level_cm FLOAT NOT NULL,
+    vfd_rpm FLOAT NOT NULL,
+    vfd_speedcmd FLOAT NOT NULL,
+    blink_2hz TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    reached_sp TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    low_level TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    high_level TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    setpoint FLOAT NULL,
+    PRIMARY KEY (ts, id),
+    KEY idx_telemetry_samples_id (id)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS (ts) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+)
+"""
+TELEMETRY_FUTURE = "p_future"
+
+ER_DUP_KEYNAME = 1061
+
+
+def _columns(conn, table):
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT column_name, column_key FROM information_schema.columns"
+        " WHERE table_schema = DATABASE() AND table_name = %s", (table,)
+    )
+    columns = {row[0].lower(): row[1] for row in cur.fetchall()}
+    cur.close()
+    return columns
+
+
+def ensure_event_log_id(conn):
+    """
+    Comprueba que event_log tenga la columna id que usa la paginación de query_events.
+    Si falta y la tabla no tiene clave primaria, la añade; si ya hay otra clave primaria, falla.
+    Devuelve True si se añadió.
+    """
+    columns = _columns(conn, "event_log")
+    if "id" in columns:
+        return False
+    if "PRI" in columns.values():
+        raise RuntimeError("event_log no tiene columna id y ya tiene otra clave primaria: "
+                           "query_events necesita id BIGINT AUTO_INCREMENT como clave primaria")
+    cur = conn.cursor()
+    cur.execute("ALTER TABLE event_log ADD COLUMN id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST")
+    cur.close()
+    return True
+
+
+def ensure_indexes(conn, indexes=EVENT_LOG_INDEXES):
+    """Verifica la columna id de event_log y crea los índices que falten (los existentes se ignoran)."""
+    ensure_event_log_id(conn)
+    cur = conn.cursor()
+    for name, ddl in indexes.items():
+        try:
+            cur.execute(ddl)
+        except mysql.err.OperationalError as ex:
+            if ex.args[0] != ER_DUP_KEYNAME:
+                raise
+    cur.close()
+
+
+# ----------------- Particiones de telemetry_samples -----------------
+def partition_name(day):
+    return "p%s" % day.strftime("%Y%m%d")
+
+
+def _partition_day(name):
+    try:
+        return datetime.strptime(name, "p%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def telemetry_partitions(conn):
+    """Nombres de las particiones actuales de telemetry_samples, en orden."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT partition_name FROM information_schema.partitions"
+        " WHERE table_schema = DATABASE() AND table_name = 'telemetry_samples'"
+        " AND partition_name IS NOT NULL ORDER BY partition_ordinal_position"
+    )
+    names = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return names
+
+
+def ensure_partitions(conn, days_ahead=7, today=None):
+    """
+    Crea una partición por día desde hoy hasta hoy + days_ahead, partiendo p_future.
+    Devuelve las particiones creadas.
+    """
+    names = telemetry_partitions(conn)
+    if TELEMETRY_FUTURE not in names:
+        raise RuntimeError("telemetry_samples no está particionada por día: ejecuta python mysql_schema.py "
+                           "(migrate_telemetry_table) para migrarla")
+    today = today or datetime.now(timezone.utc).date()
+    days = [d for d in map(_partition_day, names) if d is not None]
+    first = max(days) + timedelta(days=1) if days else today
+    new = [first + timedelta(days=i) for i in range((today + timedelta(days=days_ahead) - first).days + 1)]
+    if not new:
+        return []
+    parts = ", ".join("PARTITION %s VALUES LESS THAN ('%s')" % (partition_name(d), d + timedelta(days=1)) for d in new)
+    cur = conn.cursor()
+    cur.execute("ALTER TABLE telemetry_samples REORGANIZE PARTITION %s INTO (%s, PARTITION %s VALUES LESS THAN (MAXVALUE))"
+                % (TELEMETRY_FUTURE, parts, TELEMETRY_FUTURE))
+    cur.close()
+    return [partition_name(d) for d in new]
+
+
+def drop_partitions_older_than(conn, days_to_keep, today=None):
+    """
+    Retención: elimina las particiones de días anteriores a hoy - days_to_keep.
+    DROP PARTITION libera el día completo al instante, sin DELETE fila a fila.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=days_to_keep)
+    old = [n for n in telemetry_partitions(conn) if (_partition_day(n) or date.max) < cutoff]
+    if old:
+        cur = conn.cursor()
+        cur.execute("ALTER TABLE telemetry_samples DROP PARTITION %s" % ", ".join(old))
+        cur.close()
+    return old
+
+
+def migrate_telemetry_table(conn, today=None):
+    """
+    Lleva una telemetry_samples existente al esquema de TELEMETRY_TABLE:
+    - añade setpoint (y id, si no lo tiene)
+    - ts pasa a DATETIME(3) y la clave primaria a (ts, id): RANGE COLUMNS no admite TIMESTAMP
+      y la columna de partición debe estar en toda clave única
+    - particiona por día desde el día de la muestra más antigua hasta hoy, más p_future
+    Reescribe la tabla entera: conviene hacerlo en una ventana de mantenimiento. Con la sesión en
+    UTC (mysql_db.connect) los TIMESTAMP se convierten a DATETIME en UTC. Devuelve los pasos aplicados.
+    """
+    columns = _columns(conn, "telemetry_samples")
+    steps = []
+    if not columns:
+        return steps
+    cur = conn.cursor()
+    if "setpoint" not in columns:
+        cur.execute("ALTER TABLE telemetry_samples ADD COLUMN setpoint FLOAT NULL")
+        steps.append("columna setpoint")
+    if TELEMETRY_FUTURE not in telemetry_partitions(conn):
+        clauses = []
+        if "id" in columns:
+            clauses.append("MODIFY id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT")
+        else:
+            clauses.append("ADD COLUMN id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT FIRST")
+        clauses.append("MODIFY ts DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)")
+        if "PRI" in columns.values():
+            clauses.append("DROP PRIMARY KEY")
+        clauses += ["ADD PRIMARY KEY (ts, id)", "ADD KEY idx_telemetry_samples_id (id)"]
+        cur.execute("ALTER TABLE telemetry_samples " + ", ".join(clauses))
+        steps.append("clave primaria (ts, id)")
+
+        today = today or datetime.now(timezone.utc).date()
+        cur.execute("SELECT DATE(MIN(ts)) FROM telemetry_samples")
+        first = cur.fetchone()[0] or today
+        days = [first + timedelta(days=i) for i in range((today - first).days + 1)]
+        parts = ["PARTITION %s VALUES LESS THAN ('%s')" % (partition_name(d), d + timedelta(days=1)) for d in days]
+        parts.append("PARTITION %s VALUES LESS THAN (MAXVALUE)" % TELEMETRY_FUTURE)
+        cur.execute("ALTER TABLE telemetry_samples PARTITION BY RANGE COLUMNS (ts) (%s)" % ", ".join(parts))
+        steps.append("%d particiones diarias" % len(days))
+    cur.close()
+    return steps
+
+
+def create_telemetry_table(conn, days_ahead=7):
+    """Crea telemetry_samples o migra la existente; después crea las particiones por adelantado."""
+    cur = conn.cursor()
+    cur.execute(TELEMETRY_TABLE)
+    cur.close()
+    migrate_telemetry_table(conn)
+    return ensure_partitions(conn, days_ahead)
+
+
+if __name__ == "__main__":
+    import argparse
+    from mysql_db import connect
+
+    parser = argparse.ArgumentParser(description="Crea / mantiene el esquema MySQL del SCADA")
+    parser.add_argument("--days-ahead", type=int, default=7, help="días de particiones creadas por adelantado")
+    parser.add_argument("--retention-days", type=int, help="eliminar particiones más antiguas que esto")
+    args = parser.parse_args()
+
+    conn = connect()
+    ensure_indexes(conn)
+    print("Columna id e índices de event_log verificados")
+    steps = migrate_telemetry_table(conn)
+    if steps:
+        print("telemetry_samples migrada: " + ", ".join(steps))
+    created = create_telemetry_table(conn, args.days_ahead)
+    print("telemetry_samples: %d particiones nuevas" % len(created))
+    if args.retention_days is not None:
+        dropped = drop_partitions_older_than(conn, args.retention_days)
+        print("telemetry_samples: %d particiones eliminadas" % len(dropped))
+    conn.close()
@@ -0,0 +1,108 @@
+# parallel_fetch.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# Pool pequeño compartido por todas las sesiones: las consultas del panel son pocas y cortas
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scada-fetch")
+# Consultas en curso por clave: [future, instante de envío, llamadas esperándola]. Si una sesión
+# pide lo mismo mientras la anterior sigue corriendo, la espera en lugar de encolar otra
+_inflight = {}
+# Instante de la última escritura por ámbito (clave[0]): una consulta enviada antes no se reutiliza
+_writes = {}
+# Último resultado bueno por clave (LRU): [instante de envío, resultado]
+_LAST_GOOD_MAX = 32
+_last_good = OrderedDict()
+_lock = threading.RLock()
+
+
+def note_write(scope):
+    """Marca que el ámbito `scope` acaba de escribir: las consultas ya en curso quedan viejas."""
+    with _lock:
+        _writes[scope] = time.monotonic()
+
+
+def _finished(key, entry):
+    def callback(future):
+        with _lock:
+            if _inflight.get(key) is entry:
+                del _inflight[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            # una consulta más antigua que termine tarde no pisa un resultado más nuevo
+            cached = _last_good.get(key)
+            if cached is None or cached[0] <= entry[1]:
+                _last_good[key] = [entry[1], future.result()]
+                _last_good.move_to_end(key)
+                while len(_last_good) > _LAST_GOOD_MAX:
+                    _last_good.popitem(last=False)
+    return callback
+
+
+def _submit(key, fn):
+    """Devuelve (entrada, propia): propia si esta llamada envió la consulta."""
+    with _lock:
+        entry = _inflight.get(key)
+        written = _writes.get(key[0])
+        own = entry is None or entry[0].done() or (written is not None and entry[1] <= written)
+        if own:
+            entry = [None, time.monotonic(), 0]
+            entry[0] = _executor.submit(fn)
+            _inflight[key] = entry
+            entry[0].add_done_callback(_finished(key, entry))
+        entry[2] += 1
+        return entry, own
+
+
+def fetch_parallel(tasks, timeout=5.0, default=None, keys=None):
+    """
+    Ejecuta consultas independientes a la vez y espera a cada una como máximo su timeout.
+    - tasks: dict nombre -> función sin argumentos
+    - timeout: segundos (igual para todas) o dict nombre -> segundos
+    - default: función nombre -> valor cuando una consulta vence sin resultado previo
+    - keys: dict nombre -> tupla (ámbito, ...) con todo lo que determina el resultado
+      (backend/cliente, límites, filtros); el ámbito es el que se pasa a note_write
+    Devuelve (resultados, stale): para las consultas que vencieron se devuelve el último
+    resultado bueno con esa misma clave (o default) y su nombre queda en el conjunto stale.
+    Una consulta en curso con la misma clave se reutiliza salvo que haya habido una escritura
+    en su ámbito después de enviarla. Al vencer, solo se cancela la consulta que esta llamada
+    envió y nadie más espera; si ya empezó, termina y deja su resultado para la próxima vez.
+    Los errores de una consulta se propagan igual que en la llamada secuencial.
+    """
+    keys = keys or {}
+    start = time.monotonic()
+    submitted = {}
+    for name, fn in tasks.items():
+        key = keys.get(name, ("", name))
+        submitted[name] = (key,) + _submit(key, fn)
+
+    results, stale = {}, set()
+    for name, (key, entry, own) in submitted.items():
+        limit = timeout.get(name, 5.0) if isinstance(timeout, dict) else timeout
+        remaining = max(0.0, start + limit - time.monotonic())
+        done = _wait(entry[0], remaining)
+        with _lock:
+            entry[2] -= 1
+            if not done and own and entry[2] == 0:
+                entry[0].cancel()
+            cached = _last_good.get(key)
+        if done:
+            results[name] = entry[0].result()
+        else:
+            stale.add(name)
+            results[name] = cached[1] if cached is not None else (default(name) if default else None)
+    return results, stale
+
+
+def _wait(future, seconds):
+    """True si la consulta terminó (bien o con error) dentro del plazo."""
+    if future.cancelled():
+        return False
+    try:
+        future.exception(timeout=seconds)
+        return True
+    except FutureTimeout:
+        return False
+    except CancelledError:
+        return False
@@ -8,6 +8,7 @@ import firebase_admin
 from firebase_admin import credentials, db
 from snap7 import client
 from snap7.util import *
+import os
 import time
 from datetime import datetime
 import struct
@@ -32,6 +33,11 @@ FIREBASE_DB_URL = "https://console.firebase.google.com/u/0/project/scada-3bc42/f
 # Frecuencia de actualización
 UPDATE_INTERVAL = 1.0  # segundos
 
+# Copia opcional de la telemetría en MySQL (telemetry_samples particionada, ver mysql_schema.py)
+# Se activa definiendo DB_HOST / DB_USER / DB_PASSWORD / DB_NAME en el entorno
+MYSQL_ENABLED = bool(os.getenv("DB_HOST"))
+MYSQL_RETENTION_DAYS = int(os.getenv("MYSQL_RETENTION_DAYS", "30"))
+
 # ----------------- Mapeo de Variables UMNG -----------------
 """
 Según tu estructura en TIA Portal:
@@ -71,6 +77,13 @@ class PLCFirebaseGateway:
         self.connected = False
         self.last_command_id = None
         self.last_setpoint = None
+        self.mysql_writer = None
+        if MYSQL_ENABLED:
+            from mysql_db import TelemetryBulkWriter
+            # lotes de hasta 1000 filas o cada 10 s escritos por un hilo de fondo: una caída de
+            # MySQL no frena el lazo (ni los comandos al PLC); se guardan hasta 50000 muestras
+            self.mysql_writer = TelemetryBulkWriter(batch_size=1000, flush_interval=10.0)
+            logger.info("✓ Copia de telemetría en MySQL activada")
         
     def connect_plc(self):
         """Conecta al PLC S7"""
@@ -273,6 +286,19 @@ class PLCFirebaseGateway:
             logger.error(f"Error escribiendo comando al PLC: {e}")
             return False
     
+    def maintain_mysql_partitions(self):
+        """Crea las particiones de los próximos días y elimina las que salen de la retención"""
+        from mysql_db import get_pool
+        from mysql_schema import ensure_partitions, drop_partitions_older_than
+        try:
+            with get_pool().connection() as conn:
+                ensure_partitions(conn)
+                dropped = drop_partitions_older_than(conn, MYSQL_RETENTION_DAYS)
+            if dropped:
+                logger.info(f"🗑️  Particiones MySQL eliminadas: {', '.join(dropped)}")
+        except Exception as e:
+            logger.error(f"Error manteniendo particiones MySQL: {e}")
+    
     def cleanup_old_telemetry(self, days_to_keep=7):
         """Limpia datos antiguos de Firebase"""
         try:
@@ -303,6 +329,9 @@ class PLCFirebaseGateway:
         logger.info(f"   Intervalo: {UPDATE_INTERVAL}s")
         logger.info(f"   Estructura: Variables en Marcas (%M), Entradas (%I), Salidas (%Q)")
         
+        if self.mysql_writer:
+            self.maintain_mysql_partitions()
+        
         cleanup_counter = 0
         
         while True:
@@ -322,6 +351,10 @@ class PLCFirebaseGateway:
                     # Enviar a Firebase
                     self.write_telemetry_to_firebase(telemetry)
                     
+                    # Encolar para MySQL (se inserta en lotes)
+                    if self.mysql_writer:
+                        self.mysql_writer.add(telemetry)
+                    
                     # Mostrar alarmas si existen
                     if telemetry['low_level'] == 1:
                         logger.warning("⚠️  ALARMA: Nivel bajo activado")
@@ -335,6 +368,8 @@ class PLCFirebaseGateway:
                 cleanup_counter += 1
                 if cleanup_counter >= 1000:
                     self.cleanup_old_telemetry()
+                    if self.mysql_writer:
+                        self.maintain_mysql_partitions()
                     cleanup_counter = 0
                 
                 # Esperar antes de la siguiente iteración
@@ -349,6 +384,11 @@ class PLCFirebaseGateway:
                 time.sleep(5)
         
         # Cleanup
+        if self.mysql_writer:
+            try:
+                self.mysql_writer.close()
+            except Exception as e:
+                logger.error(f"Error vaciando el buffer de MySQL: {e}")
         self.disconnect_plc()
         logger.info("Gateway detenido correctamente")
 
@@ -0,0 +1,200 @@
+# telemetry_archive.py
+"""
+Archivo histórico de telemetry_samples en Parquet comprimido, particionado por día:
+
+    <archivo>/date=YYYY-MM-DD/telemetry.parquet
+
+Lee la fuente por trozos con cursor (memoria acotada a un día) y escribe cada día en un único
+archivo. Si el día ya estaba archivado se fusiona: las muestras nuevas reemplazan a las del
+archivo dentro del intervalo que cubren y se conservan las de fuera, así que re-archivar un
+rango (o archivar el otro backend, o un día ya recortado por la limpieza de Firestore) no
+duplica ni pierde filas.
+
+Uso:
+    python telemetry_archive.py firestore --start 2026-01-01 --end 2026-02-01
+    python telemetry_archive.py mysql --start 2026-01-01 --end 2026-02-01 --out archive
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+ARCHIVE_DIR = os.getenv("TELEMETRY_ARCHIVE_DIR", "archive")
+
+SCHEMA = pa.schema([
+    ("ts", pa.timestamp("us", tz="UTC")),
+    ("level_cm", pa.float32()),
+    ("vfd_rpm", pa.float32()),
+    ("vfd_speedcmd", pa.float32()),
+    ("blink_2hz", pa.uint8()),
+    ("reached_sp", pa.uint8()),
+    ("low_level", pa.uint8()),
+    ("high_level", pa.uint8()),
+    ("setpoint", pa.float32()),  # nulo en muestras sin setpoint registrado
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+DAY_FILE = "telemetry.parquet"
+_US_PER_DAY = 86400 * 1000 * 1000
+
+
+def _to_table(df):
+    """DataFrame de telemetría (Firestore o MySQL) -> tabla Arrow con el esquema del archivo."""
+    df = df.copy()
+    # MySQL devuelve DATETIME sin zona: se guarda en UTC
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    if "setpoint" not in df:
+        df["setpoint"] = None
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+class _DayWriter:
+    """Acumula el día en curso (los trozos llegan en orden cronológico) y lo escribe al cambiar de día."""
+
+    def __init__(self, out_dir, source, compression="zstd"):
+        self.out_dir = out_dir
+        self.source = source
+        self.compression = compression
+        self.day = None
+        self.parts = []
+        self.files = []
+
+    def write(self, table):
+        # número de día UTC de cada fila (µs desde epoch // µs por día); los cortes son donde cambia
+        days = table.column("ts").cast(pa.int64()).to_numpy() // _US_PER_DAY
+        bounds = [0] + list(np.flatnonzero(np.diff(days)) + 1) + [len(days)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            day = str(np.datetime64(int(days[start]), "D"))
+            if day != self.day:
+                self.close()
+                self.day = day
+            self.parts.append(table.slice(start, stop - start))
+
+    def close(self):
+        if self.parts:
+            self.files.append(self._write_day(self.day, pa.concat_tables(self.parts)))
+        self.parts = []
+
+    def _write_day(self, day, new):
+        folder = os.path.join(self.out_dir, "date=%s" % day)
+        os.makedirs(folder, exist_ok=True)
+        # incluye archivos de otros nombres (p. ej. de versiones anteriores): se fusionan y se borran
+        old_files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".parquet"))
+        table = new
+        if old_files:
+            old = ds.dataset(old_files, format="parquet", schema=SCHEMA).to_table()
+            ts = new.column("ts")
+            lo = pa.scalar(pc.min(ts).as_py(), SCHEMA.field("ts").type)
+            hi = pa.scalar(pc.max(ts).as_py(), SCHEMA.field("ts").type)
+            keep = pc.or_(pc.less(old.column("ts"), lo), pc.greater(old.column("ts"), hi))
+            table = pa.concat_tables([old.filter(keep), new]).sort_by("ts")
+        path = os.path.join(folder, DAY_FILE)
+        # se escribe a un temporal oculto (el dataset ignora los nombres con punto) y se reemplaza
+        tmp = os.path.join(folder, ".%s.tmp" % DAY_FILE)
+        pq.write_table(table.replace_schema_metadata({"source": self.source}), tmp,
+                       compression=self.compression)
+        os.replace(tmp, path)
+        for old_path in old_files:
+            if old_path != path:
+                os.remove(old_path)
+        return path
+
+
+def archive_chunks(chunks, out_dir=ARCHIVE_DIR, source="telemetry"):
+    """Escribe un iterable de DataFrames cronológicos en el archivo; devuelve (filas, archivos)."""
+    writer = _DayWriter(out_dir, source)
+    rows = 0
+    try:
+        for df in chunks:
+            if df.empty:
+                continue
+            writer.write(_to_table(df))
+            rows += len(df)
+    finally:
+        writer.close()
+    return rows, writer.files
+
+
+def archive_firestore(client, start, end, out_dir=ARCHIVE_DIR, chunk_size=5000):
+    from firestore_db import iter_telemetry_firestore
+    return archive_chunks(iter_telemetry_firestore(client, start, end, chunk_size), out_dir, "firestore")
+
+
+def archive_mysql(start, end, out_dir=ARCHIVE_DIR, chunk_size=5000):
+    from mysql_db import iter_telemetry
+    # las columnas DATETIME de MySQL no tienen zona: se consulta con valores naive en UTC
+    start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    return archive_chunks(iter_telemetry(start, end, chunk_size), out_dir, "mysql")
+
+
+def archived_days(archive_dir=ARCHIVE_DIR):
+    """Días (YYYY-MM-DD) que tienen archivo, en orden."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(name[len("date="):] for name in os.listdir(archive_dir)
+                  if name.startswith("date=") and os.path.isfile(day_path(name[len("date="):], archive_dir)))
+
+
+def day_path(day, archive_dir=ARCHIVE_DIR):
+    """Ruta del Parquet de un día (YYYY-MM-DD)."""
+    return os.path.join(archive_dir, "date=%s" % day, DAY_FILE)
+
+
+def scan_archive(start, end, archive_dir=ARCHIVE_DIR, batch_size=64 * 1024):
+    """Lotes Arrow del archivo en [start, end); solo abre las particiones de esos días."""
+    if not os.path.isdir(archive_dir):
+        return iter(())
+    dataset = ds.dataset(archive_dir, format="parquet", partitioning=PARTITIONING,
+                         schema=SCHEMA.append(pa.field("date", pa.string())))
+    last_day = (end - timedelta(microseconds=1)).strftime("%Y-%m-%d")
+    flt = ((ds.field("date") >= start.strftime("%Y-%m-%d")) & (ds.field("date") <= last_day)
+           & (ds.field("ts") >= pa.scalar(start, SCHEMA.field("ts").type))
+           & (ds.field("ts") < pa.scalar(end, SCHEMA.field("ts").type)))
+    # sin hilos los lotes salen en el orden de los archivos (uno por día, ordenado por ts): cronológico
+    return dataset.scanner(columns=SCHEMA.names, filter=flt, batch_size=batch_size, use_threads=False).to_batches()
+
+
+def export_csv(start, end, archive_dir=ARCHIVE_DIR):
+    """
+    Vuelca el rango a un CSV temporal lote a lote, sin materializar todo en un DataFrame.
+    Devuelve (ruta, filas); quien la usa debe borrar el archivo.
+    """
+    fd, path = tempfile.mkstemp(prefix="telemetria-", suffix=".csv")
+    os.close(fd)
+    rows = 0
+    with pacsv.CSVWriter(path, SCHEMA) as writer:
+        for batch in scan_archive(start, end, archive_dir):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return path, rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def utc_date(text):
+        return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+    parser = argparse.ArgumentParser(description="Archiva telemetry_samples en Parquet por día")
+    parser.add_argument("source", choices=["firestore", "mysql"])
+    parser.add_argument("--start", type=utc_date, required=True, help="YYYY-MM-DD (UTC, incluido)")
+    parser.add_argument("--end", type=utc_date, required=True, help="YYYY-MM-DD (UTC, excluido)")
+    parser.add_argument("--out", default=ARCHIVE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.source == "firestore":
+        from dotenv import load_dotenv
+        load_dotenv()
+        from firestore_db import get_firestore_client
+        rows, files = archive_firestore(get_firestore_client(), args.start, args.end, args.out, args.chunk_size)
+    else:
+        rows, files = archive_mysql(args.start, args.end, args.out, args.chunk_size)
+    print("%d muestras archivadas en %d archivos bajo %s" % (rows, len(files), args.out))